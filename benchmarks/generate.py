@@ -0,0 +1,172 @@
+"""Generator of synthetic documents for the benchmarks."""
+
+import argparse
+import random
+
+# Words used for the titles, the descriptions and the text
+WORDS = [
+    "alpha",
+    "beta",
+    "gamma",
+    "delta",
+    "epsilon",
+    "zeta",
+    "theta",
+    "kappa",
+    "lambda",
+    "sigma",
+    "omega",
+    "matrix",
+    "vector",
+    "graph",
+    "tree",
+    "node",
+    "edge",
+    "proof",
+    "lemma",
+    "bound",
+    "limit",
+    "series",
+]
+
+
+def words(rnd: random.Random, length: int) -> str:
+    """
+    Draw a sequence of words.
+
+    Arguments
+    ---------
+    rnd
+        The random generator
+    length
+        The number of words
+
+    Returns
+    -------
+    str
+        The words separated by spaces
+    """
+    return " ".join(rnd.choice(WORDS) for _ in range(length))
+
+
+def generate(
+    headers: int = 50,
+    items: int = 1000,
+    categories: int = 4,
+    references: int = 500,
+    title_length: int = 3,
+    description_length: int = 1,
+    paragraphs: int = 2000,
+    seed: int = 0,
+) -> str:
+    """
+    Generate a markdown document.
+
+    The items are spread over the headers and over the categories. A third
+    of the references are ``[%D %n](#tag "%T")`` links, a third are
+    ``@category:tag`` citations and a third are ``%c`` counts in the titles
+    of the items.
+
+    Arguments
+    ---------
+    headers
+        The number of headers (a third of them are level 1 headers)
+    items
+        The number of numbered items
+    categories
+        The number of categories
+    references
+        The number of references
+    title_length
+        The number of words of the titles (0 for no titles)
+    description_length
+        The number of words of the descriptions
+    paragraphs
+        The number of paragraphs of plain text
+    seed
+        The seed of the random generator
+
+    Returns
+    -------
+    str
+        The markdown text of the document
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    rnd = random.Random(seed)
+    names = [f"cat{index}" for index in range(categories)]
+    lines = ["---", "pandoc-numbering:"]
+    for name in names:
+        lines.extend(
+            [
+                f"  {name}:",
+                "    general:",
+                f"      listing-title: List of {name}",
+                "      sectioning-levels: '+.+.'",
+            ]
+        )
+    lines.extend(["---", ""])
+
+    counts = min(references // 3, items)
+    tags = [f"{names[index % categories]}:i{index}" for index in range(items)]
+    blocks = []
+    for index, tag in enumerate(tags):
+        category, name = tag.split(":")
+        description = words(rnd, description_length).capitalize() or "Item"
+        title = words(rnd, title_length)
+        if index < counts:
+            title = f"{title} %c".strip()
+        marker = f"#{category}:{name}"
+        if title:
+            blocks.append(f"{description} ({title}) {marker}")
+        else:
+            blocks.append(f"{description} {marker}")
+    for index in range(references - counts):
+        tag = rnd.choice(tags)
+        if index % 2:
+            blocks.append(f'See [%D %n](#{tag} "%T") {words(rnd, 5)}.')
+        else:
+            blocks.append(f"See @{tag} {words(rnd, 5)}.")
+    blocks.extend(f"{words(rnd, 30).capitalize()}." for _ in range(paragraphs))
+    rnd.shuffle(blocks)
+
+    # Headers evenly spread among the blocks
+    step = max(len(blocks) // max(headers, 1), 1)
+    for index in range(headers):
+        level = 1 if index % 3 == 0 else 2
+        blocks.insert(
+            min(index * (step + 1), len(blocks)),
+            "#" * level + f" Header {index}",
+        )
+    return "\n".join(lines) + "\n" + "\n\n".join(blocks) + "\n"
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the options of the generator to a parser.
+
+    Arguments
+    ---------
+    parser
+        The parser
+    """
+    parser.add_argument("--headers", type=int, default=50)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=4)
+    parser.add_argument("--references", type=int, default=500)
+    parser.add_argument("--title-length", type=int, default=3)
+    parser.add_argument("--description-length", type=int, default=1)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main() -> None:
+    """
+    Write a generated document on the standard output.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    print(generate(**vars(parser.parse_args())), end="")
+
+
+if __name__ == "__main__":
+    main()
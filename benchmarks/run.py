@@ -0,0 +1,104 @@
+"""Benchmark of the steps of pandoc-numbering on a generated document."""
+
+import argparse
+import io
+import os
+import shutil
+import time
+
+from generate import add_arguments, generate
+from panflute import convert_text
+
+from pandoc_numbering import _main
+from pandoc_numbering._stream import load
+
+# Steps of the filter, in order
+STEPS = ("load", "prepare", "numbering", "referencing", "finalize")
+
+# Directory of the stand-in for pandoc
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub")
+
+
+def measure(text: str, output_format: str) -> dict[str, float]:
+    """
+    Run the filter on a document and measure each step.
+
+    Arguments
+    ---------
+    text
+        The pandoc JSON text of the document
+    output_format
+        The output format
+
+    Returns
+    -------
+    dict[str, float]
+        The duration of each step (in seconds) and the number of pandoc calls
+    """
+    times = {}
+    start = time.perf_counter()
+    doc = load(io.StringIO(text), output_format=output_format)
+    doc.format = output_format
+    times["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _main.prepare(doc)
+    times["prepare"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    doc.walk(_main.traversing, doc)
+    times["numbering"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _main.resolve_fixups(doc)
+    times["referencing"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _main.finalize(doc)
+    times["finalize"] = time.perf_counter() - start
+
+    times["calls"] = doc.conversions.calls
+    return times
+
+
+def main() -> None:
+    """
+    Print the best duration of each step in each output format.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    parser.add_argument("--formats", nargs="+", default=["markdown", "latex"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--stub",
+        action="store_true",
+        help="answer the conversions with a stand-in for pandoc",
+    )
+    args = vars(parser.parse_args())
+    formats = args.pop("formats")
+    repeat = args.pop("repeat")
+    stub = args.pop("stub")
+
+    # The document is always read by the real pandoc
+    text = convert_text(
+        generate(**args),
+        output_format="json",
+        standalone=True,
+        pandoc_path=shutil.which("pandoc"),
+    )
+    if stub:
+        os.environ["PATH"] = STUB + os.pathsep + os.environ.get("PATH", "")
+
+    print(f"{'format':<10}" + "".join(f"{step:>12}" for step in STEPS) + "  calls")
+    for output_format in formats:
+        runs = [measure(text, output_format) for _ in range(repeat)]
+        best = {step: min(run[step] for run in runs) for step in STEPS}
+        print(
+            f"{output_format:<10}"
+            + "".join(f"{best[step] * 1000:>10.1f}ms" for step in STEPS)
+            + f"  {runs[0]['calls']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,101 @@
 pandoc_numbering package.
 """
 
-from ._main import Numbered, main
+# pylint: disable=import-outside-toplevel
+
+import io
+import os
+import sys
+
+from ._raw import STREAM, default_format, untouched
+
+# typing is not imported: the documents passed through do not need it
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from panflute import Doc
+
+    from ._main import Numbered
+
+
+def main(doc: "Doc | None" = None) -> None:
+    """
+    Produce the final document.
+
+    When the document is read from the standard input, it is written back
+    unchanged if it has nothing to number, without loading panflute.
+    Otherwise, only the blocks which may be numbered or referenced are
+    loaded. The document is streamed block by block when the
+    ``PANDOC_NUMBERING_STREAM`` environment variable is set. The time spent
+    in each step is reported when ``PANDOC_NUMBERING_PROFILE`` is set.
+
+    ``pandoc-numbering index [FORMAT]`` writes the index of the chapter of a
+    book read from the standard input and ``pandoc-numbering merge INDEX...``
+    merges the indexes of the chapters.
+
+    Parameters
+    ----------
+    doc
+        pandoc document
+    """
+    if doc is not None:
+        from . import _main
+
+        _main.main(doc)
+    elif sys.argv[1:2] in (["index"], ["merge"]):
+        _command(sys.argv[1], sys.argv[2:])
+    elif os.environ.get(STREAM):
+        from ._stream import stream
+
+        stream()
+    else:
+        data = sys.stdin.buffer.read()
+        if untouched(data, default_format()):
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+            return
+
+        from . import _main
+        from ._profile import Profile, timed
+        from ._stream import dump, load
+
+        profile = Profile.from_environment()
+        with timed(profile, "load"):
+            doc = load(io.StringIO(data.decode("utf-8")))
+        doc.profile = profile
+        _main.main(doc)
+        with timed(profile, "dump"):
+            dump(doc)
+        if profile is not None:
+            profile.report(doc)
+
+
+def _command(name: str, args: list[str]) -> None:
+    # Index a chapter read from the standard input or merge index files
+    import json
+
+    from . import _main
+    from ._block import dumps
+    from ._stream import load
+
+    if name == "index":
+        result = _main.chapter_index(load(output_format=args[0] if args else None))
+    else:
+        indexes = []
+        for path in args:
+            with open(path, encoding="utf-8") as file:
+                indexes.append(json.load(file))
+        result = _main.merge_indexes(indexes)
+    sys.stdout.write(dumps(result) + "\n")
+
+
+def __getattr__(name: str) -> object:
+    # Numbered is imported on demand since it needs panflute
+    if name == "Numbered":
+        from ._main import Numbered
+
+        return Numbered
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ("main", "Numbered")
 
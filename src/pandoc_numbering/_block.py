@@ -0,0 +1,69 @@
+"""Top-level blocks kept as pandoc JSON text."""
+
+import json
+from typing import Any
+
+from panflute import Block
+
+
+class JsonBlock(Block):
+    """
+    Top-level block kept as JSON text since nothing in it can be numbered.
+
+    Arguments
+    ---------
+    text
+        The JSON text of the block
+    """
+
+    __slots__ = ["text"]
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def to_json(self) -> Any:
+        """
+        Convert the block to JSON.
+
+        Returns
+        -------
+        Any
+            The JSON data of the block
+        """
+        return json.loads(self.text)
+
+
+def json_text(block: Block) -> str:
+    """
+    Get the JSON text of a top-level block.
+
+    Arguments
+    ---------
+    block
+        The block
+
+    Returns
+    -------
+    str
+        The compact JSON text of the block
+    """
+    if isinstance(block, JsonBlock):
+        return block.text
+    return dumps(block.to_json())
+
+
+def dumps(data: Any) -> str:
+    """
+    Convert JSON data to a compact JSON text.
+
+    Arguments
+    ---------
+    data
+        The JSON data
+
+    Returns
+    -------
+    str
+        The JSON text
+    """
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
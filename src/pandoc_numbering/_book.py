@@ -0,0 +1,137 @@
+"""Numbering of a book whose chapters are filtered separately."""
+
+import json
+import os
+from typing import Any
+
+from panflute import debug
+
+from ._raw import BOOK
+
+# Version of the format of the indexes and of the books
+BOOK_VERSION = 2
+
+
+class Book:
+    """
+    Merged indexes of the chapters of a book.
+
+    Arguments
+    ---------
+    data
+        The JSON data written by ``pandoc-numbering merge``
+    """
+
+    __slots__ = ["_chapters", "_collections", "_count", "_information", "_numbering"]
+
+    def __init__(self, data: dict[str, Any]):
+        self._chapters: dict[str, list[dict[str, Any]]] = {}
+        for key, start in data.get("chapters", []):
+            self._chapters.setdefault(key, []).append(start)
+        self._count: dict[str, int] = data.get("count", {})
+        self._collections: dict[str, list[str]] = data.get("collections", {})
+        self._information: dict[str, str] = data.get("information", {})
+        self._numbering: dict[str, Any] | None = data.get("numbering")
+
+    @classmethod
+    def from_environment(cls) -> "Book | None":
+        """
+        Open the book configured by the environment.
+
+        Returns
+        -------
+        Book | None
+            The book or None if no book is configured or if it is unreadable
+        """
+        path = os.environ.get(BOOK)
+        if not path:
+            return None
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as error:
+            debug(f"[WARNING] pandoc-numbering: cannot read the book: {error}")
+            return None
+        if not isinstance(data, dict) or data.get("version") != BOOK_VERSION:
+            debug(f"[WARNING] pandoc-numbering: {path} is not a merged book")
+            return None
+        return cls(data)
+
+    @property
+    def count(self) -> dict[str, int]:
+        """
+        Get the count property.
+
+        Returns
+        -------
+        dict[str, int]
+            The final count of each category.
+        """
+        return self._count
+
+    @property
+    def numbering(self) -> dict[str, Any] | None:
+        """
+        Get the numbering property.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            The JSON data of the pandoc-numbering metadata of the first
+            chapter or None.
+        """
+        return self._numbering
+
+    @property
+    def collections(self) -> dict[str, list[str]]:
+        """
+        Get the collections property.
+
+        Returns
+        -------
+        dict[str, list[str]]
+            The tags of the numbered elements of each category, in order.
+        """
+        return self._collections
+
+    def chapter(self, key: str) -> dict[str, Any] | None:
+        """
+        Get the numbering state at the start of a chapter.
+
+        Arguments
+        ---------
+        key
+            The digest of the index of the chapter
+
+        Returns
+        -------
+        dict[str, Any] | None
+            The header numbers, the header aliases, the counts and whether the
+            chapter holds the listings, or None if the chapter is not in the
+            book
+        """
+        starts = self._chapters.get(key)
+        if not starts:
+            return None
+        if len(starts) > 1:
+            debug(
+                "[WARNING] pandoc-numbering: "
+                "several chapters have the same index, the first one is used"
+            )
+        return starts[0]
+
+    def summary(self, tag: str) -> str | None:
+        """
+        Get the summary of a numbered element.
+
+        Arguments
+        ---------
+        tag
+            The tag of the element
+
+        Returns
+        -------
+        str | None
+            The JSON text of the summary or None if the tag is unknown
+        """
+        return self._information.get(tag)
@@ -0,0 +1,220 @@
+"""Persistent cache of the conversions made by pandoc."""
+
+# This module is only imported when a cache is configured
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from panflute import Element, debug
+from panflute.tools import pandoc_version as version_info
+
+from ._raw import CACHE
+
+# Environment variable giving the maximal size of the cache (in bytes)
+CACHE_SIZE = "PANDOC_NUMBERING_CACHE_SIZE"
+
+# Default maximal size of the cache (in bytes)
+DEFAULT_SIZE = 16 * 1024 * 1024
+
+
+class Cache:
+    """
+    Content-addressed cache stored in a sqlite file.
+
+    The cache is turned off if the file cannot be read or written any more,
+    for instance when it is locked by another build or corrupt: the
+    conversions are then made without it.
+
+    Arguments
+    ---------
+    path
+        The path of the cache file
+    size
+        The maximal size of the cache (in bytes)
+    """
+
+    __slots__ = ["_connection", "_size", "_version"]
+
+    def __init__(self, path: str, size: int = DEFAULT_SIZE):
+        self._size = size
+        self._version = pandoc_version()
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversions ("
+            "key TEXT PRIMARY KEY, "
+            "value TEXT NOT NULL, "
+            "used INTEGER NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS conversions_used ON conversions (used)"
+        )
+
+    @classmethod
+    def from_environment(cls) -> "Cache | None":
+        """
+        Open the cache configured by the environment.
+
+        Returns
+        -------
+        Cache | None
+            The cache or None if no cache is configured
+        """
+        path = os.environ.get(CACHE)
+        if not path:
+            return None
+        try:
+            size = int(os.environ.get(CACHE_SIZE, DEFAULT_SIZE))
+        except ValueError:
+            size = DEFAULT_SIZE
+        try:
+            return cls(path, size)
+        except sqlite3.Error:
+            return None
+
+    @property
+    def size(self) -> int:
+        """
+        Get the size property.
+
+        Returns
+        -------
+        int
+            The maximal size of the cache (in bytes).
+        """
+        return self._size
+
+    def key(self, elem: Element, output_format: str, extra_args: list[str]) -> str:
+        """
+        Compute the key of a conversion.
+
+        Arguments
+        ---------
+        elem
+            The element to convert
+        output_format
+            The output format
+        extra_args
+            Extra arguments passed to pandoc
+
+        Returns
+        -------
+        str
+            The key of the conversion
+        """
+        data = json.dumps(
+            [self._version, output_format, extra_args, elem.to_json()],
+            separators=(",", ":"),
+            sort_keys=True,
+        )
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """
+        Get a conversion from the cache.
+
+        Arguments
+        ---------
+        key
+            The key of the conversion
+
+        Returns
+        -------
+        str | None
+            The converted text or None if it is not in the cache
+        """
+        if self._connection is None:
+            return None
+        try:
+            row = self._connection.execute(
+                "SELECT value FROM conversions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE conversions SET used = ? WHERE key = ?", (time.time_ns(), key)
+            )
+        except sqlite3.Error as error:
+            self._disable(error)
+            return None
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Put a conversion in the cache.
+
+        Arguments
+        ---------
+        key
+            The key of the conversion
+        value
+            The converted text
+        """
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO conversions VALUES (?, ?, ?)",
+                (key, value, time.time_ns()),
+            )
+        except sqlite3.Error as error:
+            self._disable(error)
+
+    def commit(self) -> None:
+        """
+        Evict the least recently used conversions and save the cache.
+        """
+        if self._connection is None:
+            return
+        total = 0
+        evicted = []
+        try:
+            for key, size in self._connection.execute(
+                "SELECT key, length(key) + length(value) "
+                "FROM conversions ORDER BY used DESC"
+            ).fetchall():
+                total += size
+                if total > self._size:
+                    evicted.append((key,))
+            self._connection.executemany(
+                "DELETE FROM conversions WHERE key = ?", evicted
+            )
+            self._connection.commit()
+        except sqlite3.Error as error:
+            self._disable(error)
+
+    def close(self) -> None:
+        """
+        Save and close the cache.
+        """
+        self.commit()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _disable(self, error: Exception) -> None:
+        # The conversions are made without the cache from now on
+        debug(f"[WARNING] pandoc-numbering: the cache is turned off: {error}")
+        try:
+            self._connection.close()
+        except sqlite3.Error:
+            pass
+        self._connection = None
+
+
+def pandoc_version() -> str:
+    """
+    Get the version of pandoc.
+
+    Returns
+    -------
+    str
+        The pandoc version
+    """
+    # pandoc gives its version to the filters it runs
+    version = os.environ.get("PANDOC_VERSION")
+    if version:
+        return version
+    return ".".join(str(number) for number in version_info.version)
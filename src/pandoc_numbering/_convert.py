@@ -0,0 +1,386 @@
+"""Batch of conversions run in a single pandoc call."""
+
+# The cache and sqlite3 are only imported when a cache is configured
+# pylint: disable=import-outside-toplevel
+
+import json
+import os
+import re
+import time
+
+from panflute import Block, Doc, Element, Para, Str, convert_text, debug
+
+from ._raw import CACHE
+from ._server import SERVER, Server
+
+# Line written by pandoc between two converted fragments
+SEPARATOR = "PANDOCNUMBERINGSEPARATOR"
+
+# Prefix of the placeholders used until the conversions are run
+PLACEHOLDER = "PANDOCNUMBERINGCONVERSION"
+
+_PLACEHOLDER_REGEX = re.compile(PLACEHOLDER + "(?P<index>[0-9]+)")
+
+
+class Conversion:
+    """
+    Conversion waiting in a batch.
+
+    Arguments
+    ---------
+    placeholder
+        The placeholder standing for the converted text
+    block
+        The block to convert
+    key
+        The key of the conversion in the cache
+    """
+
+    __slots__ = ["_block", "_key", "_placeholder", "_text"]
+
+    def __init__(self, placeholder: str, block: Block, key: str | None = None):
+        self._placeholder = placeholder
+        self._block = block
+        self._key = key
+        self._text = None
+
+    @property
+    def placeholder(self) -> str:
+        """
+        Get the placeholder property.
+
+        Returns
+        -------
+        str
+            The placeholder property.
+        """
+        return self._placeholder
+
+    @property
+    def block(self) -> Block:
+        """
+        Get the block property.
+
+        Returns
+        -------
+        Block
+            The block property.
+        """
+        return self._block
+
+    @property
+    def key(self) -> str | None:
+        """
+        Get the key property.
+
+        Returns
+        -------
+        str | None
+            The key of the conversion in the cache.
+        """
+        return self._key
+
+    @property
+    def text(self) -> str | None:
+        """
+        Get the text property.
+
+        Returns
+        -------
+        str | None
+            The converted text or None if the batch has not been run.
+        """
+        return self._text
+
+    @text.setter
+    def text(self, value: str) -> None:
+        self._text = value
+
+
+class Conversions:
+    """
+    Conversions of a document.
+
+    Arguments
+    ---------
+    doc
+        The document.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    __slots__ = [
+        "_api_version",
+        "_cache",
+        "_calls",
+        "_conversions",
+        "_groups",
+        "_hits",
+        "_profile",
+        "_served",
+        "_server",
+        "_started",
+        "_targets",
+    ]
+
+    def __init__(self, doc: Doc):
+        self._api_version = doc.api_version
+        self._cache = None
+        if os.environ.get(CACHE):
+            from ._cache import Cache
+
+            self._cache = Cache.from_environment()
+        self._conversions: list[Conversion] = []
+        self._groups: dict[tuple[str, ...], list[Conversion]] = {}
+        self._targets: list[Element] = []
+        self._calls = 0
+        self._hits = 0
+        self._served = 0
+        self._profile = getattr(doc, "profile", None)
+        self._server: Server | None = None
+        self._started = False
+
+    @property
+    def calls(self) -> int:
+        """
+        Get the number of pandoc calls.
+
+        Returns
+        -------
+        int
+            The number of pandoc calls.
+        """
+        return self._calls
+
+    @property
+    def server(self) -> Server | None:
+        """
+        Get the server property.
+
+        Returns
+        -------
+        Server | None
+            The pandoc server answering the conversions.
+        """
+        return self._server
+
+    @server.setter
+    def server(self, value: Server | None) -> None:
+        # A server given by the caller replaces the one of the environment
+        self._server = value
+        self._started = True
+
+    @property
+    def served(self) -> int:
+        """
+        Get the number of pandoc calls answered by the pandoc server.
+
+        Returns
+        -------
+        int
+            The number of pandoc calls answered by the pandoc server.
+        """
+        return self._served
+
+    @property
+    def hits(self) -> int:
+        """
+        Get the number of conversions found in the cache.
+
+        Returns
+        -------
+        int
+            The number of conversions found in the cache.
+        """
+        return self._hits
+
+    def add(
+        self,
+        block: Block,
+        output_format: str = "latex",
+        extra_args: list[str] | None = None,
+    ) -> Conversion:
+        """
+        Add a conversion to the batch.
+
+        Arguments
+        ---------
+        block
+            The block to convert
+        output_format
+            The output format
+        extra_args
+            Extra arguments passed to pandoc
+
+        Returns
+        -------
+        Conversion
+            The delayed conversion
+        """
+        extra_args = extra_args or []
+        conversion = Conversion(
+            PLACEHOLDER + str(len(self._conversions)),
+            block,
+            self._cache.key(block, output_format, extra_args) if self._cache else None,
+        )
+        if self._cache and conversion.key:
+            conversion.text = self._cache.get(conversion.key)
+            if conversion.text is not None:
+                self._hits += 1
+        self._conversions.append(conversion)
+        self._groups.setdefault((output_format, *extra_args), []).append(conversion)
+        return conversion
+
+    def patch(self, elem: Element) -> Element:
+        """
+        Register an element whose text contains placeholders.
+
+        Arguments
+        ---------
+        elem
+            A RawInline or RawBlock
+
+        Returns
+        -------
+        Element
+            The same element
+        """
+        if PLACEHOLDER in elem.text:
+            self._targets.append(elem)
+        return elem
+
+    def run(self) -> None:
+        """
+        Run all the pending conversions and patch the registered elements.
+        """
+        for key, group in self._groups.items():
+            pending = [conversion for conversion in group if conversion.text is None]
+            if not pending:
+                continue
+            blocks = []
+            for conversion in pending:
+                blocks.extend((conversion.block, Para(Str(SEPARATOR))))
+            start = time.perf_counter()
+            fragments = split(self._convert(blocks, key))
+            if len(fragments) != len(pending):
+                # A fragment swallowed or produced a separator line (raw or
+                # verbatim text): each block is converted alone
+                fragments = [
+                    self._convert([conversion.block], key).strip("\n")
+                    for conversion in pending
+                ]
+            if self._profile is not None:
+                self._profile.conversion(time.perf_counter() - start)
+            for conversion, fragment in zip(pending, fragments, strict=True):
+                conversion.text = fragment
+                if self._cache and conversion.key:
+                    self._cache.put(conversion.key, fragment)
+
+        if self._cache:
+            self._cache.commit()
+
+        for elem in self._targets:
+            elem.text = self.substitute(elem.text)
+        self._targets = []
+
+    def substitute(self, text: str) -> str:
+        """
+        Replace the placeholders of a text by the converted texts.
+
+        Arguments
+        ---------
+        text
+            A text containing placeholders
+
+        Returns
+        -------
+        str
+            The text with the converted texts
+        """
+        return _PLACEHOLDER_REGEX.sub(self._result, text)
+
+    def forget(self) -> None:
+        """
+        Forget the registered elements.
+
+        Their placeholders are then left to substitute.
+        """
+        self._targets = []
+
+    def close(self) -> None:
+        """
+        Stop the pandoc server and close the cache.
+        """
+        if SERVER in os.environ:
+            debug(
+                f"[INFO] pandoc-numbering: {self._calls} pandoc call(s), "
+                f"{self._served} answered by the pandoc server"
+            )
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+
+    def _convert(self, blocks: list[Block], key: tuple[str, ...]) -> str:
+        # Convert blocks with the output format and the arguments of a group
+        return self._pandoc(
+            json.dumps(Doc(*blocks, api_version=self._api_version).to_json()),
+            "json",
+            key[0],
+            list(key[1:]),
+        )
+
+    def _pandoc(
+        self,
+        text: str,
+        input_format: str,
+        output_format: str,
+        extra_args: list[str] | None = None,
+    ) -> str:
+        self._calls += 1
+        if not self._started:
+            self._started = True
+            self._server = Server.from_environment()
+        if self._server is not None:
+            output = self._server.convert(text, input_format, output_format, extra_args)
+            if output is not None:
+                self._served += 1
+                return output
+            # Do not wait again for a failing server
+            self._server.close()
+            self._server = None
+        return convert_text(
+            text,
+            input_format=input_format,
+            output_format=output_format,
+            extra_args=extra_args,
+        )
+
+    def _result(self, match: re.Match[str]) -> str:
+        return self._conversions[int(match.group("index"))].text or ""
+
+
+def split(text: str) -> list[str]:
+    """
+    Split the output of a batch.
+
+    Arguments
+    ---------
+    text
+        The text produced by pandoc
+
+    Returns
+    -------
+    list[str]
+        The converted fragments
+    """
+    fragments = []
+    lines: list[str] = []
+    for line in text.split("\n"):
+        if line == SEPARATOR:
+            fragments.append("\n".join(lines).strip("\n"))
+            lines = []
+        else:
+            lines.append(line)
+    return fragments
@@ -0,0 +1,228 @@
+"""Counters of the numbered elements, by category and by section."""
+
+from typing import Any
+
+from panflute import debug
+
+
+class Counters:
+    """
+    Counters of the numbered elements of a document.
+
+    A counter is identified by a category and by the numbers of the
+    sections up to its last level, so it is reset when one of them changes.
+    The values are kept in ``doc.count`` under the category followed by the
+    section number, for instance ``exercise:1.2.``, so that they are saved
+    with it. Several categories can share one sequence: its values are kept
+    under the name of the sequence preceded by ``@``.
+
+    The strings built from the section numbers are computed once until the
+    next header.
+
+    Arguments
+    ---------
+    doc
+        The pandoc document, with its categories defined
+    """
+
+    __slots__ = [
+        "_aliases",
+        "_doc",
+        "_headers",
+        "_keys",
+        "_prefixes",
+        "_sections",
+        "_shared",
+    ]
+
+    def __init__(self, doc: Any):
+        self._doc = doc
+        self._headers = None
+        self._aliases = None
+        self._sections: dict[int, tuple[str, str, str]] = {}
+        self._prefixes: dict[tuple[int, int], str] = {}
+        self._keys: dict[tuple[str, int], str] = {}
+        self._shared = shared(doc.defined)
+
+    def clear(self) -> None:
+        """
+        Forget the strings built from the section numbers.
+
+        This is called each time a header changes the section numbers.
+        """
+        self._headers = self._doc.headers
+        self._aliases = self._doc.aliases
+        self._sections.clear()
+        self._prefixes.clear()
+        self._keys.clear()
+
+    def section_number(self, level: int) -> str:
+        """
+        Get the number of the current section.
+
+        Arguments
+        ---------
+        level
+            The last level of the section
+
+        Returns
+        -------
+        str
+            The numbers of the sections up to level, separated by dots
+        """
+        return self._section(level)[0]
+
+    def section_alias(self, level: int) -> str:
+        """
+        Get the alias of the current section.
+
+        Arguments
+        ---------
+        level
+            The last level of the section
+
+        Returns
+        -------
+        str
+            The identifiers of the sections up to level, separated by dots
+        """
+        return self._section(level)[1]
+
+    def leading(self, level: int) -> str:
+        """
+        Get the leading of the numbers of the current section.
+
+        Arguments
+        ---------
+        level
+            The last level of the section
+
+        Returns
+        -------
+        str
+            The section number followed by a dot or an empty string
+        """
+        return self._section(level)[2]
+
+    def prefix(self, first: int, last: int) -> str:
+        """
+        Get the visible part of the section number.
+
+        Arguments
+        ---------
+        first
+            The first visible level
+        last
+            The last level of the section
+
+        Returns
+        -------
+        str
+            The numbers of the sections from first to last, each followed by
+            a dot
+        """
+        self._check()
+        if (first, last) not in self._prefixes:
+            self._prefixes[first, last] = "".join(
+                f"{number}." for number in self._doc.headers[first:last]
+            )
+        return self._prefixes[first, last]
+
+    def key(self, category: str, level: int) -> str:
+        """
+        Get the key of the counter of a category in the current section.
+
+        Arguments
+        ---------
+        category
+            The basic category
+        level
+            The last level of the section
+
+        Returns
+        -------
+        str
+            The category followed by a colon and by the leading
+        """
+        self._check()
+        if (category, level) not in self._keys:
+            self._keys[category, level] = category + ":" + self.leading(level)
+        return self._keys[category, level]
+
+    def increment(self, category: str, level: int) -> int:
+        """
+        Count a new element of a category in the current section.
+
+        Arguments
+        ---------
+        category
+            The basic category
+        level
+            The last level of the section
+
+        Returns
+        -------
+        int
+            The number of the element
+        """
+        count = self._doc.count
+        key = self.key(category, level)
+        count[key] = count.get(key, 0) + 1
+        if category not in self._shared:
+            return count[key]
+        key = self.key("@" + self._shared[category], level)
+        count[key] = count.get(key, 0) + 1
+        return count[key]
+
+    def _check(self) -> None:
+        # The numbers of the sections are replaced when a section is restored
+        if self._headers is not self._doc.headers or (
+            self._aliases is not self._doc.aliases
+        ):
+            self.clear()
+
+    def _section(self, level: int) -> tuple[str, str, str]:
+        self._check()
+        if level not in self._sections:
+            number = ".".join(map(str, self._doc.headers[:level]))
+            alias = ".".join(alias or "0" for alias in self._doc.aliases[:level])
+            self._sections[level] = (number, alias, number + "." if level else "")
+        return self._sections[level]
+
+
+def shared(defined: dict[str, dict[str, Any]]) -> dict[str, str]:
+    """
+    Find the sequences shared by several categories.
+
+    Arguments
+    ---------
+    defined
+        The definitions of the categories
+
+    Returns
+    -------
+    dict[str, str]
+        The name of the sequence of each category sharing one
+    """
+    sequences = {}
+    for category, definition in defined.items():
+        counter = definition["counter"]
+        seen = [category]
+        while (
+            counter is not None
+            and counter not in seen
+            and counter in defined
+            and defined[counter]["counter"] is not None
+        ):
+            seen.append(counter)
+            counter = defined[counter]["counter"]
+        if counter in seen:
+            debug(
+                "[WARNING] pandoc-numbering: the counters of "
+                + ", ".join(seen)
+                + " are shared in a loop"
+            )
+        elif counter is not None:
+            sequences[category] = counter
+            sequences[counter] = counter
+    return sequences
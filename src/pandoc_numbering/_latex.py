@@ -0,0 +1,324 @@
+"""Native LaTeX writer for the inline subset used by numbering entries."""
+
+import re
+import unicodedata
+from collections.abc import Iterable
+
+from panflute import (
+    Code,
+    Element,
+    Emph,
+    Link,
+    Math,
+    Quoted,
+    SmallCaps,
+    Space,
+    Span,
+    Str,
+    Strikeout,
+    Strong,
+    Subscript,
+    Superscript,
+    Underline,
+)
+
+# Column width used by pandoc when wrapping its output
+COLUMNS = 72
+
+# Marker used for breakable spaces before the layout is computed
+_BREAK = None
+
+_COMMANDS = {
+    Emph: "\\emph",
+    Strong: "\\textbf",
+    SmallCaps: "\\textsc",
+    Strikeout: "\\st",
+    Superscript: "\\textsuperscript",
+    Subscript: "\\textsubscript",
+    Underline: "\\ul",
+}
+
+_SIMPLE = {
+    "{": "\\{",
+    "}": "\\}",
+    "$": "\\$",
+    "%": "\\%",
+    "&": "\\&",
+    "_": "\\_",
+    "#": "\\#",
+    "^": "\\^{}",
+    "[": "{[}",
+    "]": "{]}",
+    "\u00a0": "~",
+    "\u200b": "\\hspace{0pt}",
+    "\u202f": "\\,",
+}
+
+_SEQUENCES = {
+    "~": "\\textasciitilde",
+    "\\": "\\textbackslash",
+    "|": "\\textbar",
+    "<": "\\textless",
+    ">": "\\textgreater",
+    "'": "\\textquotesingle",
+}
+
+_LIGATURES = {
+    "—": "---",
+    "–": "--",
+}
+
+_QUOTES = {
+    "‘": "`",
+    "’": "'",
+    "“": "``",
+    "”": "''",
+}
+
+# Commands from the soul package which change the way math is written
+_SOUL = (Strikeout, Underline)
+
+# Characters next to which pandoc adjusts the spacing of quotes
+_QUOTING = frozenset("`'\"‘’“”")
+
+# URL fragments that pandoc does not need to percent-encode
+_URL = re.compile(r'^[^\x00-\x1f!"#$%()*,/<>?@\[\\\]^`{|}~\x7f]*$')
+
+_LABEL = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-+=:;."
+)
+
+
+def escape(text: str, code: bool = False) -> str:
+    """
+    Escape a string the way the pandoc LaTeX writer does.
+
+    Arguments
+    ---------
+    text
+        The string to escape
+    code
+        Is the string the content of inline code?
+
+    Returns
+    -------
+    str
+        The escaped string
+    """
+    # pylint: disable=too-many-branches
+    # Like pandoc, characters are processed from the end so that each decision
+    # can look at the already escaped remainder.
+    rest = ""
+    for char in reversed(text):
+        if char in _SIMPLE:
+            rest = _SIMPLE[char] + rest
+        elif char == "-":
+            rest = ("-\\/" if rest[:1] == "-" else "-") + rest
+        elif char == "`" and code:
+            rest = _sequence("\\textasciigrave", rest, code)
+        elif char in _SEQUENCES:
+            rest = _sequence(_SEQUENCES[char], rest, code)
+        elif code:
+            rest = char + rest
+        elif char in "?!":
+            rest = char + ("{\\kern0pt}" if rest[:1] == "`" else "") + rest
+        elif char == "…":
+            rest = _sequence("\\ldots", rest, code)
+        elif char in _LIGATURES:
+            rest = _LIGATURES[char] + rest
+        elif char in _QUOTES:
+            rest = _QUOTES[char] + ("\\," if rest[:1] in ("`", "'") else "") + rest
+        else:
+            rest = char + rest
+    return rest
+
+
+def _sequence(command: str, rest: str, code: bool) -> str:
+    if not code and rest[:1].isalpha():
+        return command + " " + rest
+    if not code and rest and not rest[:1].isspace():
+        return command + rest
+    return command + "{}" + rest
+
+
+def label(identifier: str) -> str:
+    """
+    Convert an identifier to a LaTeX label.
+
+    Arguments
+    ---------
+    identifier
+        The identifier
+
+    Returns
+    -------
+    str
+        The corresponding label
+    """
+    return "".join(
+        char if char in _LABEL else f"ux{ord(char):x}" for char in identifier
+    )
+
+
+def inlines_to_latex(elems: Iterable[Element]) -> str | None:
+    """
+    Convert a list of inline elements to LaTeX without calling pandoc.
+
+    Arguments
+    ---------
+    elems
+        The inline elements to convert
+
+    Returns
+    -------
+    str | None
+        The LaTeX string or None if an element is not supported
+    """
+    tokens: list[str | None] = []
+    if not _render(list(elems), tokens, False):
+        return None
+    return _layout(tokens)
+
+
+# pylint: disable=too-many-return-statements,too-many-branches
+def _render(elems: list[Element], tokens: list[str | None], soul: bool) -> bool:
+    for index, elem in enumerate(elems):
+        if isinstance(elem, Str):
+            tokens.append(escape(elem.text))
+        elif isinstance(elem, Space):
+            tokens.append(_BREAK)
+        elif type(elem) in _COMMANDS:
+            tokens.append(_COMMANDS[type(elem)] + "{")
+            if not _render(list(elem.content), tokens, soul or isinstance(elem, _SOUL)):
+                return False
+            tokens.append("}")
+        elif isinstance(elem, Code):
+            code = "\\texttt{" + escape(elem.text, code=True).replace(" ", "\\ ") + "}"
+            tokens.append("\\mbox{" + code + "}" if soul else code)
+        elif isinstance(elem, Math):
+            # pandoc protects math comments with a line break
+            if "%" in elem.text:
+                return False
+            tokens.append(_math(elem, soul))
+        elif isinstance(elem, Span):
+            if elem.attributes or any(
+                cls == "mark" or cls.startswith("csl-") for cls in elem.classes
+            ):
+                return False
+            _anchor(elem, tokens)
+            tokens.append("{")
+            if not _render(list(elem.content), tokens, soul):
+                return False
+            tokens.append("}")
+        elif isinstance(elem, Link):
+            if not elem.url.startswith("#") or not _URL.match(elem.url[1:]):
+                return False
+            _anchor(elem, tokens)
+            tokens.append("\\hyperref[" + label(elem.url[1:]) + "]{")
+            if not _render(list(elem.content), tokens, soul):
+                return False
+            tokens.append("}")
+        elif isinstance(elem, Quoted):
+            # pandoc adds thin spaces between adjacent quotes: leave it that job
+            if (index > 0 and _quoting(elems[index - 1], -1)) or (
+                index + 1 < len(elems) and _quoting(elems[index + 1], 0)
+            ):
+                return False
+            if not _render_quoted(elem, tokens, soul):
+                return False
+        else:
+            return False
+    return True
+
+
+def _quoting(elem: Element, position: int) -> bool:
+    if isinstance(elem, Quoted):
+        return True
+    return isinstance(elem, Str) and elem.text[position] in _QUOTING
+
+
+def _math(elem: Math, soul: bool) -> str:
+    if soul:
+        delimiter = "$$" if elem.format == "DisplayMath" else "$"
+        return delimiter + elem.text + delimiter
+    if elem.format == "DisplayMath":
+        return "\\[" + elem.text + "\\]"
+    return "\\(" + elem.text + "\\)"
+
+
+def _anchor(elem: Element, tokens: list[str | None]) -> None:
+    if elem.identifier:
+        tokens.append(
+            "\\protect\\phantomsection\\label{" + label(elem.identifier) + "}"
+        )
+
+
+def _render_quoted(elem: Quoted, tokens: list[str | None], soul: bool) -> bool:
+    if elem.quote_type == "DoubleQuote":
+        opening, closing = "``", "''"
+    else:
+        opening, closing = "`", "'"
+    content = elem.content
+    if content and (isinstance(content[0], Span) or isinstance(content[-1], Span)):
+        return False
+    tokens.append(opening)
+    if content and (
+        isinstance(content[0], Quoted)
+        or (isinstance(content[0], Str) and content[0].text.startswith("`"))
+    ):
+        tokens.append("\\,")
+    if not _render(list(content), tokens, soul):
+        return False
+    if content and (
+        isinstance(content[-1], Quoted)
+        or (isinstance(content[-1], Str) and content[-1].text.endswith("'"))
+    ):
+        tokens.append("\\,")
+    tokens.append(closing)
+    return True
+
+
+def _width(text: str) -> int:
+    return sum(
+        (
+            0
+            if unicodedata.combining(char)
+            else 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+        )
+        for char in text
+    )
+
+
+def _layout(tokens: list[str | None]) -> str:
+    # Group the literal tokens into unbreakable words
+    words = []
+    word = ""
+    for token in tokens:
+        if token is _BREAK:
+            if word:
+                words.append(word)
+            word = ""
+        else:
+            word += token
+    if word:
+        words.append(word)
+
+    # Greedy line filling, as done by pandoc
+    lines = []
+    line = ""
+    width = 0
+    for word in words:
+        size = _width(word)
+        if line and width + 1 + size > COLUMNS:
+            lines.append(line)
+            line = ""
+            width = 0
+        if line:
+            line += " " + word
+            width += 1 + size
+        else:
+            line = word
+            width = size
+    if line:
+        lines.append(line)
+    return "\n".join(lines)
@@ -4,10 +4,12 @@
 
 """Pandoc filter to number all kinds of things."""
 
-import copy
+import json
+import os
 import re
+import time
 import unicodedata
-from functools import partial
+from functools import lru_cache
 from textwrap import dedent
 from typing import Any
 
@@ -55,6 +57,48 @@ from panflute import (
     run_filters,
     stringify,
 )
+from panflute.elements import from_json
+
+from ._block import JsonBlock, dumps, json_text
+from ._book import BOOK, BOOK_VERSION, Book
+from ._convert import Conversions
+from ._counter import Counters
+from ._latex import inlines_to_latex
+from ._profile import Profile, timed
+from ._record import FIELDS, Record, plain_text
+from ._server import SERVER, Server
+from ._slug import slug, unique
+from ._state import STATE, State, digest
+from ._template import Template, clone, contains, replace
+
+# Environment variable enabling the report of the numbering statistics
+STATISTICS = "PANDOC_NUMBERING_STATISTICS"
+
+# Environment variable giving the number of processes numbering the sections
+JOBS = "PANDOC_NUMBERING_JOBS"
+
+# Environment variable enabling the LaTeX macros rendering the listing entries
+MACROS = "PANDOC_NUMBERING_LATEX_MACROS"
+
+# Text standing for the arguments of a LaTeX macro while it is converted
+ARGUMENT = "PANDOCNUMBERINGARGUMENT"
+
+# Characters forming a TeX ligature (--, !` or ?`) with the following or the
+# preceding text, which pandoc only breaks inside a text
+LIGATURE_BEFORE = frozenset("-!?")
+LIGATURE_AFTER = frozenset("-`")
+
+# Link to a numbered element
+LINK_REGEX = re.compile("^#(?P<tag>([a-zA-Z][\\w:.-]*))$")
+
+# Category whose counter is shared
+COUNTER_REGEX = re.compile("^[a-zA-Z][\\w.-]*$")
+
+# Citation of a numbered element (@prefix:name shortcut)
+CITE_REGEX = re.compile(
+    "^(@(?P<tag>(?P<category>[a-zA-Z][\\w.-]*):"
+    "(([a-zA-Z][\\w.-]*)|(\\d*(\\.\\d*)*))))$"
+)
 
 
 # pylint: disable=bad-option-value,useless-object-inheritance
@@ -68,6 +112,8 @@ class Numbered:
         An element.
     doc
         The document.
+    render
+        False to only update the count of the category of the element.
     """
 
     # pylint: disable=too-many-instance-attributes
@@ -76,11 +122,11 @@ class Numbered:
         "_doc",
         "_match",
         "_tag",
-        "_entry",
-        "_link",
-        "_caption",
+        "_record",
         "_title",
         "_description",
+        "_title_text",
+        "_description_text",
         "_category",
         "_basic_category",
         "_classes",
@@ -117,7 +163,7 @@ class Numbered:
         str
             The entry property.
         """
-        return self._entry
+        return None if self._record is None else self._record.entry
 
     @property
     def link(self) -> str:
@@ -129,7 +175,7 @@ class Numbered:
         str
             The link property.
         """
-        return self._link
+        return None if self._record is None else self._record.link
 
     @property
     def title(self) -> str:
@@ -237,7 +283,7 @@ class Numbered:
         str
             The caption property.
         """
-        return self._caption
+        return None if self._record is None else self._record.caption
 
     number_regex = "#((?P<prefix>[a-zA-Z][\\w.-]*):)?(?P<name>[a-zA-Z][\\w:.-]*)?"
     _regex = "(?P<header>(?P<hidden>(-\\.)*)(\\+\\.)*)"
@@ -246,12 +292,14 @@ class Numbered:
     double_sharp_regex = "^" + _regex + "#" + number_regex + "$"
 
     @staticmethod
+    @lru_cache(maxsize=4096)
     def _remove_accents(string):
         nfkd_form = unicodedata.normalize("NFKD", string)
         # pylint: disable=redundant-u-string-prefix
         return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
 
     @staticmethod
+    @lru_cache(maxsize=4096)
     def identifier(string: str) -> str:
         """
         Convert a string to a valid identifier.
@@ -274,15 +322,15 @@ class Numbered:
         # Remove leading digits
         return re.sub("^[^a-zA-Z]+", "", string)
 
-    def __init__(self, elem: Element, doc: Doc):
+    def __init__(self, elem: Element, doc: Doc, render: bool = True):
         self._elem = elem
         self._doc = doc
         self._tag = None
-        self._entry = Span(classes=["pandoc-numbering-entry"])
-        self._link = Span(classes=["pandoc-numbering-link"])
-        self._caption = None
+        self._record = None
         self._title = None
         self._description = None
+        self._title_text = None
+        self._description_text = None
         self._category = None
         self._basic_category = None
         self._classes = None
@@ -296,13 +344,28 @@ class Numbered:
         self._section_alias = None
         self._alias = None
 
-        if self._get_content() and isinstance(self._get_content()[-1], Str):
-            self._match = re.match(Numbered.marker_regex, self._get_content()[-1].text)
+        content = self._get_content()
+        if content and isinstance(content[-1], Str):
+            self._match = re.match(Numbered.marker_regex, content[-1].text)
             if self._match:
-                self._replace_marker()
-            elif re.match(Numbered.double_sharp_regex, self._get_content()[-1].text):
+                self._replace_marker(render)
+            elif re.match(Numbered.double_sharp_regex, content[-1].text):
                 self._replace_double_sharp()
 
+        # Do not keep the document alive through the element
+        self._elem = None
+
+    def record(self) -> Record | None:
+        """
+        Get the results used by the references and the listings.
+
+        Returns
+        -------
+        Record | None
+            The compact results of the element or None if it is not numbered
+        """
+        return self._record
+
     def _set_content(self, content):
         if isinstance(self._elem, Para):
             self._elem.content = content
@@ -321,7 +384,7 @@ class Numbered:
             "##", "#", 1
         )
 
-    def _replace_marker(self):
+    def _replace_marker(self, render: bool):
         self._compute_title()
         self._compute_description()
         self._compute_basic_category()
@@ -331,6 +394,8 @@ class Numbered:
         self._compute_leading()
         self._compute_category()
         self._compute_number()
+        if not render:
+            return
         self._compute_tag()
         self._compute_alias()
         self._compute_local_number()
@@ -353,18 +418,18 @@ class Numbered:
                     del self._get_content()[i - 1 : -2]
                     break
         self._title = list(self._title)
+        self._title_text = plain_text(self._title)
 
     def _compute_description(self):
         self._description = self._get_content()[:-2]
         # Detach from original parent
         self._description.parent = None
         self._description = list(self._description)
+        self._description_text = plain_text(self._description)
 
     def _compute_basic_category(self):
         if self._match.group("prefix") is None:
-            self._basic_category = Numbered.identifier(
-                "".join(map(stringify, self._description))
-            )
+            self._basic_category = Numbered.identifier(self._description_text)
         else:
             self._basic_category = self._match.group("prefix")
         if self._basic_category not in self._doc.defined:
@@ -385,35 +450,27 @@ class Numbered:
             ]
 
     def _compute_section_number(self):
-        self._section_number = ".".join(
-            map(str, self._doc.headers[: self._last_section_level])
+        self._section_number = self._doc.counters.section_number(
+            self._last_section_level
         )
 
     def _compute_section_alias(self):
-        strings = list(map(str, self._doc.aliases[: self._last_section_level]))
-        for index, string in enumerate(strings):
-            if string == "":
-                strings[index] = "0"
-        self._section_alias = ".".join(strings)
+        self._section_alias = self._doc.counters.section_alias(self._last_section_level)
 
     def _compute_leading(self):
         # Compute the leading (composed of the section numbering and a dot)
-        if self._last_section_level != 0:
-            self._leading = self._section_number + "."
-        else:
-            self._leading = ""
+        self._leading = self._doc.counters.leading(self._last_section_level)
 
     def _compute_category(self):
-        self._category = self._basic_category + ":" + self._leading
-
-        # Is it a new category?
-        if self._category not in self._doc.count:
-            self._doc.count[self._category] = 0
-
-        self._doc.count[self._category] = self._doc.count[self._category] + 1
+        self._category = self._doc.counters.key(
+            self._basic_category, self._last_section_level
+        )
 
     def _compute_number(self):
-        self._number = str(self._doc.count[self._category])
+        # Count the element in its category and in the sequence it shares
+        self._number = str(
+            self._doc.counters.increment(self._basic_category, self._last_section_level)
+        )
 
     def _compute_tag(self):
         self._classes = [
@@ -453,23 +510,20 @@ class Numbered:
                     + ":"
                     + self._section_alias
                     + "."
-                    + Numbered.identifier(stringify(Span(*self._title)))
+                    + Numbered.identifier(self._title_text)
                 )
             else:
                 self._alias = (
-                    self._basic_category
-                    + ":"
-                    + Numbered.identifier(stringify(Span(*self._title)))
+                    self._basic_category + ":" + Numbered.identifier(self._title_text)
                 )
 
     def _compute_local_number(self):
         # Replace the '-.-.+.+...#' by the category count (omitting the hidden part)
-        self._local_number = ".".join(
-            map(
-                str,
-                self._doc.headers[self._first_section_level : self._last_section_level]
-                + [self._number],
+        self._local_number = (
+            self._doc.counters.prefix(
+                self._first_section_level, self._last_section_level
             )
+            + self._number
         )
 
     def _compute_global_number(self):
@@ -480,7 +534,6 @@ class Numbered:
             self._global_number = self._number
 
     def _compute_data(self):
-        # pylint: disable=too-many-statements,no-member
         classes = self._doc.defined[self._basic_category]["classes"]
         if self._alias == self._tag:
             self._set_content(
@@ -502,80 +555,19 @@ class Numbered:
                     ),
                 ]
             )
-        self._link.classes = self._link.classes + classes
-        self._entry.classes = self._entry.classes + classes
 
-        # Prepare the final data
-        if self._title:
-            self._get_content()[1].content = copy.deepcopy(
-                self._doc.defined[self._basic_category]["format-text-title"]
-            )
-            self._link.content = copy.deepcopy(
-                self._doc.defined[self._basic_category]["format-link-title"]
-            )
-            self._entry.content = copy.deepcopy(
-                self._doc.defined[self._basic_category]["format-entry-title"]
-            )
-            self._caption = self._doc.defined[self._basic_category][
-                "format-caption-title"
-            ]
-        else:
-            self._get_content()[1].content = copy.deepcopy(
-                self._doc.defined[self._basic_category]["format-text-classic"]
-            )
-            self._link.content = copy.deepcopy(
-                self._doc.defined[self._basic_category]["format-link-classic"]
-            )
-            self._entry.content = copy.deepcopy(
-                self._doc.defined[self._basic_category]["format-entry-classic"]
-            )
-            self._caption = self._doc.defined[self._basic_category][
-                "format-caption-classic"
-            ]
-
-        # Compute caption (delay replacing %c at the end)
-        title = stringify(Span(*self._title))
-        description = stringify(Span(*self._description))
-        self._caption = self._caption.replace("%t", title.lower())
-        self._caption = self._caption.replace("%T", title)
-        self._caption = self._caption.replace("%d", description.lower())
-        self._caption = self._caption.replace("%D", description)
-        self._caption = self._caption.replace("%s", self._section_number)
-        self._caption = self._caption.replace("%g", self._global_number)
-        self._caption = self._caption.replace("%n", self._local_number)
-        self._caption = self._caption.replace("#", self._local_number)
-        if self._doc.format in {"tex", "latex"}:
-            self._caption = self._caption.replace("%p", "\\pageref{" + self._tag + "}")
-
-        # Compute content
-        if isinstance(self._elem, DefinitionItem):
-            replace_description(Plain(*self._elem.term), self._description)
-            replace_title(Plain(*self._elem.term), self._title)
-            replace_global_number(Plain(*self._elem.term), self._global_number)
-            replace_section_number(Plain(*self._elem.term), self._section_number)
-            replace_local_number(Plain(*self._elem.term), self._local_number)
-        else:
-            replace_description(self._elem, self._description)
-            replace_title(self._elem, self._title)
-            replace_global_number(self._elem, self._global_number)
-            replace_section_number(self._elem, self._section_number)
-            replace_local_number(self._elem, self._local_number)
-
-        # Compute link
-        replace_description(self._link, self._description)
-        replace_title(self._link, self._title)
-        replace_global_number(self._link, self._global_number)
-        replace_section_number(self._link, self._section_number)
-        replace_local_number(self._link, self._local_number)
-        if self._doc.format in {"tex", "latex"}:
-            replace_page_number(self._link, self._tag)
-
-        # Compute entry
-        replace_description(self._entry, self._description)
-        replace_title(self._entry, self._title)
-        replace_global_number(self._entry, self._global_number)
-        replace_section_number(self._entry, self._section_number)
-        replace_local_number(self._entry, self._local_number)
+        # The link, the entry and the caption are only rendered when used
+        definition = self._doc.defined[self._basic_category]
+        self._record = Record(
+            {name: getattr(self, "_" + name) for name in FIELDS},
+            (self._title_text, self._description_text),
+            definition,
+            self._doc.format in {"tex", "latex"},
+        )
+        kind = "title" if self._title else "classic"
+        self._get_content()[1].content = definition["templates"][
+            "format-text-" + kind
+        ].render(self._record.values())
 
         # Finalize the content
         if self._doc.format in {"tex", "latex"}:
@@ -584,113 +576,131 @@ class Numbered:
                 "\\phantomsection"
                 f"\\addcontentsline{{{latex_category}}}{{{latex_category}}}"
                 f"{{\\protect\\numberline {{{self._leading + self._number}}}"
-                f"{{\\ignorespaces {to_latex(self._entry)}"
+                f"{{\\ignorespaces {self._latex_entry(definition, kind)}"
                 "}}"
             )
-            self._get_content().insert(0, RawInline(latex, "tex"))
-
-
-def replace_description(where: Element, description: list[Element]) -> None:
-    """
-    Replace description in where.
+            self._get_content().insert(
+                0, self._doc.conversions.patch(RawInline(latex, "tex"))
+            )
 
-    Arguments
-    ---------
-    where
-        where to replace
-    description
-        replace %D and %d by description
-    """
-    where.walk(partial(replacing, search="%D", replace=copy.deepcopy(description)))
-    where.walk(
-        partial(
-            replacing,
-            search="%d",
-            replace=[item.walk(lowering) for item in copy.deepcopy(description)],
-        )
-    )
+    def _latex_entry(self, definition: dict[str, Any], kind: str) -> Any:
+        template = definition["templates"]["format-entry-" + kind]
+        if self._doc.macros and template.bare is not None:
+            # The value alone needs no macro
+            value = self._record.values()[template.bare]
+            if not contains(value, template.keys):
+                return "{" + inlines_latex(value, self._doc) + "}"
+        elif self._doc.macros and macro_safe(template):
+            values = self._record.values()
+            arguments = [values[key] for key in template.placeholders]
+            # A value containing a placeholder is replaced again by the template
+            if not any(contains(value, template.keys) for value in arguments):
+                return entry_macro(self._basic_category, kind) + "".join(
+                    "{" + inlines_latex(value, self._doc) + "}" for value in arguments
+                )
+        return to_latex(self._record.entry, self._doc)
 
 
-def replace_title(where: Element, title: list[Element]) -> None:
+def entry_macro(category: str, kind: str) -> str:
     """
-    Replace title in where.
+    Get the name of the LaTeX macro rendering the listing entries of a category.
 
     Arguments
     ---------
-    where
-        where to replace
-    title
-        replace %T and %t by title
-    """
-    where.walk(partial(replacing, search="%T", replace=copy.deepcopy(title)))
-    where.walk(
-        partial(
-            replacing,
-            search="%t",
-            replace=[item.walk(lowering) for item in copy.deepcopy(title)],
-        )
-    )
+    category
+        The basic category
+    kind
+        The variant of the entry (classic or title)
 
+    Returns
+    -------
+    str
+        The name of the macro, distinct for each category
+    """
+    # Letters are kept, z is doubled and the other characters are written
+    # in hexadecimal with the letters a to p, between z and y
+    name = ""
+    for char in category:
+        if char == "z":
+            name += "zz"
+        elif char.isascii() and char.isalpha():
+            name += char
+        else:
+            digits = f"{ord(char):x}"
+            name += "z" + "".join(chr(97 + int(digit, 16)) for digit in digits) + "y"
+    return f"\\pnentry{kind[0]}{name}"
 
-def replace_section_number(where: Element, section_number: int) -> None:
-    """
-    Replace section number in where.
 
-    Arguments
-    ---------
-    where
-        where to replace
-    section_number
-        replace %s by section_number
+@lru_cache(maxsize=256)
+def macro_safe(template: Template) -> bool:
     """
-    where.walk(partial(replacing, search="%s", replace=[Str(section_number)]))
+    Tell if the listing entries of a template can be written with a macro.
 
-
-def replace_global_number(where: Element, global_number: int) -> None:
-    """
-    Replace global number in where.
+    pandoc breaks the TeX ligatures inside a text, but cannot break them
+    between the text of a macro and its arguments.
 
     Arguments
     ---------
-    where
-        where to replace
-    global_number
-        replace %g by global_number
-    """
-    where.walk(partial(replacing, search="%g", replace=[Str(global_number)]))
-
-
-def replace_local_number(where: Element, local_number: int) -> None:
-    """
-    Replace local number in where.
+    template
+        The template of the entries
 
-    Arguments
-    ---------
-    where
-        where to replace
-    local_number
-        replace %n and # by local_number
+    Returns
+    -------
+    bool
+        False if a ligature could be formed with an argument
     """
-    where.walk(partial(replacing, search="%n", replace=[Str(local_number)]))
-    where.walk(partial(replacing, search="#", replace=[Str(local_number)]))
+    parts = stringify(
+        Plain(*template.render({key: [Str(ARGUMENT)] for key in template.keys}))
+    ).split(ARGUMENT)
+    for index in range(1, len(parts)):
+        before, after = parts[index - 1], parts[index]
+        if before[-1:] in LIGATURE_BEFORE or after[:1] in LIGATURE_AFTER:
+            return False
+        # Two arguments side by side
+        if not after and index + 1 < len(parts):
+            return False
+    return True
 
 
-def replace_page_number(where: Element, tag: str):
+def add_entry_macros(doc: Doc) -> None:
     """
-    Replace page number in where.
+    Define the LaTeX macros rendering the listing entries in the header-includes.
 
     Arguments
     ---------
-    where
-        where to replace
-    tag
-        replace %p by tag
+    doc
+        The pandoc document
     """
-    where.walk(
-        partial(
-            replacing, search="%p", replace=[RawInline("\\pageref{" + tag + "}", "tex")]
-        )
-    )
+    for category, definition in doc.defined.items():
+        for kind in ("classic", "title"):
+            template = definition["templates"]["format-entry-" + kind]
+            if template.bare is not None or not macro_safe(template):
+                continue
+            markers = {
+                key: [Str(ARGUMENT + chr(65 + index))]
+                for index, key in enumerate(template.placeholders)
+            }
+            plain = run_filters(
+                [remove_useless_latex], doc=Plain(*template.render(markers))
+            )
+
+            def arguments(elem: Element, _) -> Element | None:
+                if isinstance(elem, Str) and elem.text.startswith(ARGUMENT):
+                    return RawInline(f"#{ord(elem.text[-1]) - 64}", "tex")
+                return None
+
+            plain.walk(arguments)
+            doc.metadata["header-includes"].append(
+                MetaInlines(
+                    doc.conversions.patch(
+                        RawInline(
+                            f"\\providecommand{{{entry_macro(category, kind)}}}"
+                            f"[{len(markers)}]{{{{{plain_to_latex(plain, doc)}}}}}",
+                            "tex",
+                        )
+                    )
+                )
+            )
 
 
 def replace_count(where: Element, count: str) -> None:
@@ -704,7 +714,7 @@ def replace_count(where: Element, count: str) -> None:
     count
         replace %c by count
     """
-    where.walk(partial(replacing, search="%c", replace=[Str(count)]))
+    replace(where, ["%c"], {"%c": [Str(count)]})
 
 
 def remove_useless_latex(elem: Element, _) -> list[Element] | None:
@@ -755,7 +765,7 @@ def remove_useless_latex(elem: Element, _) -> list[Element] | None:
     return None
 
 
-def to_latex(elem: Element) -> Any:
+def to_latex(elem: Element, doc: Doc | None = None) -> Any:
     """
     Convert element to LaTeX.
 
@@ -763,14 +773,65 @@ def to_latex(elem: Element) -> Any:
     ---------
     elem
         elem to convert
+    doc
+        pandoc document used to delay the conversions pandoc has to do
 
     Returns
     -------
     Any
-        LaTex string
+        LaTex string (or a placeholder until the conversions of doc are run)
     """
+    return plain_to_latex(run_filters([remove_useless_latex], doc=Plain(elem)), doc)
+
+
+def inlines_latex(inlines: list[Element], doc: Doc) -> Any:
+    """
+    Convert copies of inline elements to LaTeX.
+
+    Arguments
+    ---------
+    inlines
+        inline elements to convert
+    doc
+        pandoc document used to delay the conversions pandoc has to do
+
+    Returns
+    -------
+    Any
+        LaTex string (or a placeholder until the conversions of doc are run)
+    """
+    plain = Plain(*map(clone, inlines))
+    return plain_to_latex(run_filters([remove_useless_latex], doc=plain), doc)
+
+
+def plain_to_latex(plain: Plain, doc: Doc | None = None) -> Any:
+    """
+    Convert a Plain block to LaTeX.
+
+    Arguments
+    ---------
+    plain
+        the Plain block to convert
+    doc
+        pandoc document used to delay the conversions pandoc has to do
+
+    Returns
+    -------
+    Any
+        LaTex string (or a placeholder until the conversions of doc are run)
+    """
+    # Avoid running pandoc for the usual inline elements
+    latex = inlines_to_latex(plain.content)
+    if latex is not None:
+        return latex
+
+    if doc is not None:
+        return doc.conversions.add(
+            plain, extra_args=["--syntax-highlighting=none"]
+        ).placeholder
+
     return convert_text(
-        run_filters([remove_useless_latex], doc=Plain(elem)),
+        plain,
         input_format="panflute",
         output_format="latex",
         extra_args=["--syntax-highlighting=none"],
@@ -792,6 +853,7 @@ def define(category: str, doc: Doc) -> None:
     doc.defined[category] = {
         "first-section-level": 0,
         "last-section-level": 0,
+        "counter": None,
         "format-text-classic": [Strong(Str("%D"), Space(), Str("%n"))],
         "format-text-title": [
             Strong(Str("%D"), Space(), Str("%n")),
@@ -818,82 +880,211 @@ def define(category: str, doc: Doc) -> None:
         doc.defined[category]["entry-space"] = 2.3
     else:
         doc.defined[category]["format-entry-classic"] = [Str("%D"), Space(), Str("%g")]
+    compile_templates(category, doc)
 
 
-def lowering(elem: Element, _) -> None:
+def compile_templates(category: str, doc: Doc) -> None:
     """
-    Lower element.
+    Compile the format templates of a category.
 
     Arguments
     ---------
-    elem
-        element to lower
+    category
+        category to compile
+    doc
+        pandoc document
     """
-    if isinstance(elem, Str):
-        elem.text = elem.text.lower()
+    keys = ["%D", "%d", "%T", "%t", "%g", "%s", "%n", "#"]
+    link_keys = keys + ["%p"] if doc.format in {"tex", "latex"} else keys
+    doc.defined[category]["templates"] = {
+        f"format-{kind}-{variant}": Template(
+            doc.defined[category][f"format-{kind}-{variant}"],
+            link_keys if kind == "link" else keys,
+        )
+        for kind in ("text", "link", "entry")
+        for variant in ("classic", "title")
+    }
 
 
-def replacing(
-    elem: Element,
-    _,
-    search: str | None = None,
-    replace: list[Any] | None = None,
-) -> list[Element]:
+def numbering(elem: Element, doc: Doc) -> None:
     """
-    Replace an element.
+    Add the numbering of an element.
 
     Arguments
     ---------
     elem
-        element to scan
-    search
-        string to search
-    replace
-        string to replace
-
-    Returns
-    -------
-    list[Element]
-        The modified elements.
+        element to number
+    doc
+        pandoc document
     """
-    if replace is None:
-        replace = []
-    if isinstance(elem, Str):
-        search_splitted = elem.text.split(search)
-        if len(search_splitted) > 1:
-            text = []
+    if isinstance(elem, Header):
+        update_header_numbers(elem, doc)
+        update_header_aliases(elem, doc)
+        update_header_identifiers(elem, doc)
+    elif isinstance(elem, (Para, DefinitionItem)) and marked(elem, doc):
+        numbered = Numbered(elem, doc)
+        if numbered.tag is not None:
+            doc.information[numbered.tag] = numbered.record()
+            doc.statistics["numbered"] += 1
+
 
-            if search_splitted[0] != "":
-                text.append(Str(search_splitted[0]))
+def marked(elem: Element, doc: Doc) -> bool:
+    """
+    Tell if a Para or a DefinitionItem can end with a numbering marker.
 
-            for string in search_splitted[1:]:
-                text.extend(replace)
-                if string != "":
-                    text.append(Str(string))
+    This quick check avoids the parsing of most of the paragraphs.
 
-            return text
+    Arguments
+    ---------
+    elem
+        a Para or a DefinitionItem
+    doc
+        pandoc document
 
-    return [elem]
+    Returns
+    -------
+    bool
+        False if the element cannot be numbered
+    """
+    content = elem.content if isinstance(elem, Para) else elem.term
+    if content and isinstance(content[-1], Str) and "#" in content[-1].text:
+        doc.statistics["parsed"] += 1
+        return True
+    doc.statistics["rejected"] += 1
+    return False
 
 
-def numbering(elem: Element, doc: Doc) -> None:
+def traversing(elem: Element, doc: Doc) -> None:
     """
-    Add the numbering of an element.
+    Add the numbering of an element and record the elements to reference.
+
+    The references are resolved by finalize once all the elements are
+    numbered, so the document is traversed only once.
 
     Arguments
     ---------
     elem
-        element to number
+        element to number or to record
     doc
         pandoc document
     """
-    if isinstance(elem, Header):
+    if isinstance(elem, (Link, Cite, Span)):
+        if referable(elem, doc):
+            doc.fixups.append(elem)
+    elif isinstance(elem, Header):
         update_header_numbers(elem, doc)
         update_header_aliases(elem, doc)
-    elif isinstance(elem, (Para, DefinitionItem)):
+        update_header_identifiers(elem, doc)
+    elif isinstance(elem, (Para, DefinitionItem)) and marked(elem, doc):
+        content = (elem.content if isinstance(elem, Para) else elem.term).list[:]
+        start = time.perf_counter() if doc.profile is not None else 0.0
         numbered = Numbered(elem, doc)
         if numbered.tag is not None:
-            doc.information[numbered.tag] = numbered
+            doc.information[numbered.tag] = numbered.record()
+            doc.statistics["numbered"] += 1
+            update_fixups(elem, content, doc)
+            if doc.profile is not None:
+                doc.profile.numbered(
+                    numbered.tag.split(":", 1)[0], time.perf_counter() - start
+                )
+
+
+def referable(elem: Element, doc: Doc) -> bool:
+    """
+    Tell if an element could be modified by referencing.
+
+    Arguments
+    ---------
+    elem
+        a Link, a Cite or a Span
+    doc
+        pandoc document
+
+    Returns
+    -------
+    bool
+        False if referencing will never modify the element
+    """
+    # All the tags contain a colon
+    if isinstance(elem, Link):
+        match = LINK_REGEX.match(elem.url)
+        return match is not None and ":" in match.group("tag")
+    if isinstance(elem, Cite):
+        if len(elem.content) == 1 and isinstance(elem.content[0], Str):
+            match = CITE_REGEX.match(elem.content[0].text)
+            # The categories defined later have the shortcut enabled
+            return match is not None and (
+                match.group("category") not in doc.defined
+                or doc.defined[match.group("category")]["cite-shortcut"]
+            )
+        return False
+    return ":" in elem.identifier
+
+
+def update_fixups(elem: Element, content: list[Element], doc: Doc) -> None:
+    """
+    Update the fix-up table after the numbering of an element.
+
+    The elements recorded inside the replaced content are forgotten and the
+    ones of the new content are recorded instead.
+
+    Arguments
+    ---------
+    elem
+        numbered Para or DefinitionItem
+    content
+        replaced content
+    doc
+        pandoc document
+    """
+    # The descendants of elem are the last recorded elements. The parents of
+    # the replaced elements cannot be trusted: the title and the description
+    # are reused elsewhere.
+    replaced = {id(item) for item in content}
+    kept = []
+    while doc.fixups:
+        ancestor = doc.fixups[-1]
+        while not (ancestor is None or ancestor is elem or id(ancestor) in replaced):
+            ancestor = ancestor.parent
+        if ancestor is None:
+            break
+        item = doc.fixups.pop()
+        if ancestor is elem:
+            # Element inside the definitions of a DefinitionItem
+            kept.append(item)
+
+    def recording(item: Element, _) -> None:
+        if isinstance(item, (Link, Cite, Span)) and referable(item, doc):
+            doc.fixups.append(item)
+
+    for item in elem.content if isinstance(elem, Para) else elem.term:
+        item.walk(recording, doc)
+    doc.fixups.extend(reversed(kept))
+
+
+def resolve_fixups(doc: Doc) -> None:
+    """
+    Reference the elements recorded by traversing.
+
+    Arguments
+    ---------
+    doc
+        pandoc document
+    """
+    # The positions of the items of each container are computed once
+    positions: dict[int, dict[int, int]] = {}
+    for elem in doc.fixups:
+        result = referencing(elem, doc)
+        if result is not None:
+            container = elem.container
+            if id(container) not in positions:
+                positions[id(container)] = {
+                    id(item): index for index, item in enumerate(container.list)
+                }
+            container[positions[id(container)][id(elem)]] = result
+            result.parent = elem.parent
+            result.location = elem.location
+    doc.fixups = []
 
 
 def referencing(elem: Element, doc: Doc) -> Element | None:
@@ -932,32 +1123,27 @@ def referencing_link(elem: Element, doc: Doc) -> None:
     doc
         pandoc document
     """
-    match = re.match("^#(?P<tag>([a-zA-Z][\\w:.-]*))$", elem.url)
+    match = LINK_REGEX.match(elem.url)
     if match:
         tag = match.group("tag")
         if tag in doc.information:
-            replace_title(elem, doc.information[tag].title)
-            replace_description(elem, doc.information[tag].description)
-            replace_global_number(elem, doc.information[tag].global_number)
-            replace_section_number(elem, doc.information[tag].section_number)
-            replace_local_number(elem, doc.information[tag].local_number)
-            replace_count(elem, str(doc.count[doc.information[tag].category]))
+            information = doc.information[tag]
+            keys = ["%T", "%t", "%D", "%d", "%g", "%s", "%n", "#", "%c"]
             if doc.format in {"tex", "latex"}:
-                replace_page_number(elem, tag)
-
-            title = stringify(Span(*doc.information[tag].title))
-            description = stringify(Span(*doc.information[tag].description))
-            elem.title = elem.title.replace("%t", title.lower())
-            elem.title = elem.title.replace("%T", title)
-            elem.title = elem.title.replace("%d", description.lower())
-            elem.title = elem.title.replace("%D", description)
-            elem.title = elem.title.replace("%s", doc.information[tag].section_number)
-            elem.title = elem.title.replace("%g", doc.information[tag].global_number)
-            elem.title = elem.title.replace("%n", doc.information[tag].local_number)
-            elem.title = elem.title.replace("#", doc.information[tag].local_number)
-            elem.title = elem.title.replace(
-                "%c", str(doc.count[doc.information[tag].category])
-            )
+                keys.append("%p")
+            values = information.values()
+            values["%c"] = [Str(str(doc.count[information.category]))]
+            replace(elem, keys, values)
+
+            elem.title = elem.title.replace("%t", information.title_lower)
+            elem.title = elem.title.replace("%T", information.title_text)
+            elem.title = elem.title.replace("%d", information.description_lower)
+            elem.title = elem.title.replace("%D", information.description_text)
+            elem.title = elem.title.replace("%s", information.section_number)
+            elem.title = elem.title.replace("%g", information.global_number)
+            elem.title = elem.title.replace("%n", information.local_number)
+            elem.title = elem.title.replace("#", information.local_number)
+            elem.title = elem.title.replace("%c", str(doc.count[information.category]))
             if doc.format in {"tex", "latex"}:
                 elem.title = elem.title.replace("%p", "\\pageref{" + tag + "}")
 
@@ -979,11 +1165,7 @@ def referencing_cite(elem: Element, doc: Doc) -> Element | None:
         A Link or None
     """
     if len(elem.content) == 1 and isinstance(elem.content[0], Str):
-        match = re.match(
-            "^(@(?P<tag>(?P<category>[a-zA-Z][\\w.-]*):"
-            "(([a-zA-Z][\\w.-]*)|(\\d*(\\.\\d*)*))))$",
-            elem.content[0].text,
-        )
+        match = CITE_REGEX.match(elem.content[0].text)
         if match:
             category = match.group("category")
             if category in doc.defined and doc.defined[category]["cite-shortcut"]:
@@ -1017,6 +1199,7 @@ def update_header_numbers(elem: Element, doc: Doc) -> None:
         doc.headers[elem.level - 1] = doc.headers[elem.level - 1] + 1
         for index in range(elem.level, 6):
             doc.headers[index] = 0
+        doc.counters.clear()
 
 
 def update_header_aliases(elem: Element, doc: Doc) -> None:
@@ -1033,9 +1216,25 @@ def update_header_aliases(elem: Element, doc: Doc) -> None:
     doc.aliases[elem.level - 1] = elem.identifier
     for index in range(elem.level, 6):
         doc.aliases[index] = ""
+    doc.counters.clear()
 
 
-def prepare(doc: Doc) -> None:
+def update_header_identifiers(elem: Element, doc: Doc) -> None:
+    """
+    Update the identifiers used by headers.
+
+    Arguments
+    ---------
+    elem
+        element to update
+    doc
+        pandoc document
+    """
+    if elem.identifier:
+        doc.identifiers[elem.identifier] = doc.identifiers.get(elem.identifier, 0) + 1
+
+
+def prepare(doc: Doc, configuration: MetaMap | None = None) -> None:
     """
     Prepare document.
 
@@ -1043,23 +1242,32 @@ def prepare(doc: Doc) -> None:
     ---------
     doc
         pandoc document
+    configuration
+        The definitions of the categories (the ``pandoc-numbering`` metadata
+        of the document by default)
     """
+    # The profile is started by the entry point
+    doc.profile = getattr(doc, "profile", None)
     doc.headers = [0, 0, 0, 0, 0, 0]
     doc.aliases = ["", "", "", "", "", ""]
+    doc.identifiers = {}
     doc.information = {}
     doc.defined = {}
 
-    if "pandoc-numbering" in doc.metadata.content and isinstance(
-        doc.metadata.content["pandoc-numbering"], MetaMap
-    ):
-        for category, definition in doc.metadata.content[
-            "pandoc-numbering"
-        ].content.items():
+    if configuration is None and "pandoc-numbering" in doc.metadata.content:
+        configuration = doc.metadata.content["pandoc-numbering"]
+    if isinstance(configuration, MetaMap):
+        for category, definition in configuration.content.items():
             if isinstance(definition, MetaMap):
                 add_definition(category, definition, doc)
 
     doc.count = {}
+    doc.counters = Counters(doc)
     doc.collections = {}
+    doc.conversions = Conversions(doc)
+    doc.macros = doc.format in {"tex", "latex"} and bool(os.environ.get(MACROS))
+    doc.fixups = []
+    doc.statistics = {"rejected": 0, "parsed": 0, "numbered": 0}
 
 
 def add_definition(category: str, definition: dict[str, MetaList], doc: Doc):
@@ -1084,6 +1292,7 @@ def add_definition(category: str, definition: dict[str, MetaList], doc: Doc):
         meta_listing(category, definition["general"], doc.defined)
         meta_levels(category, definition["general"], doc.defined)
         meta_classes(category, definition["general"], doc.defined)
+        meta_counter(category, definition["general"], doc.defined)
 
     # Detect LaTeX options
     if doc.format in {"tex", "latex"}:
@@ -1102,6 +1311,9 @@ def add_definition(category: str, definition: dict[str, MetaList], doc: Doc):
             meta_format_caption(category, definition["standard"], doc.defined)
             meta_format_entry(category, definition["standard"], doc.defined)
 
+    # Compile the customized templates
+    compile_templates(category, doc)
+
 
 def meta_cite(
     category: str,
@@ -1511,6 +1723,80 @@ def meta_classes(
         ]
 
 
+def meta_counter(
+    category: str,
+    definition: dict[str, MetaList],
+    defined: dict[str, dict[str, str | None]],  # noqa: TAE002
+) -> None:
+    """
+    Compute the counter shared by a category.
+
+    Arguments
+    ---------
+    category
+        The category
+    definition
+        The definition
+    defined
+        The defined parameter
+    """
+    if "counter" not in definition:
+        return
+    value = None
+    if isinstance(definition["counter"], MetaString):
+        value = definition["counter"].text
+    elif (
+        isinstance(definition["counter"], MetaInlines)
+        and len(definition["counter"].content) == 1
+        and isinstance(definition["counter"].content[0], Str)
+    ):
+        value = definition["counter"].content[0].text
+    if value is None or not COUNTER_REGEX.match(value):
+        debug(
+            "[WARNING] pandoc-numbering: counter is not correct for category "
+            + category
+        )
+    elif value != category:
+        defined[category]["counter"] = value
+
+
+def add_latex_packages(doc: Doc):
+    """
+    Add the LaTeX packages used by the listings to the header-includes.
+
+    Arguments
+    ---------
+    doc
+        The pandoc document
+    """
+    # Add header-includes if necessary
+    if "header-includes" not in doc.metadata:
+        doc.metadata["header-includes"] = MetaList()
+    # Convert header-includes to MetaList if necessary
+    elif not isinstance(doc.metadata["header-includes"], MetaList):
+        doc.metadata["header-includes"] = MetaList(doc.metadata["header-includes"])
+
+    doc.metadata["header-includes"].append(
+        MetaInlines(
+            RawInline(
+                dedent(r"""
+                    \makeatletter
+                    \@ifpackageloaded{subfig}{
+                        \usepackage[subfigure]{tocloft}
+                    }{
+                        \usepackage{tocloft}
+                    }
+                    \makeatother
+                    """),
+                "tex",
+            )
+        )
+    )
+    doc.metadata["header-includes"].append(
+        MetaInlines(RawInline(r"\usepackage{etoolbox}", "tex"))
+    )
+
+
 def finalize(doc: Doc):
     """
     Finalize document.
@@ -1520,117 +1806,101 @@ def finalize(doc: Doc):
     doc
         The pandoc document
     """
-    # Loop on all listings definition
+    # Resolve the references recorded by traversing
+    with timed(doc.profile, "referencing"):
+        resolve_fixups(doc)
 
     if doc.format in {"tex", "latex"}:
-        # Add header-includes if necessary
-        if "header-includes" not in doc.metadata:
-            doc.metadata["header-includes"] = MetaList()
-        # Convert header-includes to MetaList if necessary
-        elif not isinstance(doc.metadata["header-includes"], MetaList):
-            doc.metadata["header-includes"] = MetaList(doc.metadata["header-includes"])
+        add_latex_packages(doc)
+        if doc.macros:
+            add_entry_macros(doc)
+
+    listings = {
+        category: definition
+        for category, definition in doc.defined.items()
+        if definition["listing-title"] is not None
+    }
 
-        doc.metadata["header-includes"].append(
-            MetaInlines(
-                RawInline(
-                    dedent(r"""
-                        \makeatletter
-                        \@ifpackageloaded{subfig}{
-                            \usepackage[subfigure]{tocloft}
-                        }{
-                            \usepackage{tocloft}
-                        }
-                        \makeatother
-                        """),
-                    "tex",
-                )
+    # Delay the conversions to run them all at once
+    if doc.format in {"tex", "latex"}:
+        titles = {
+            category: doc.conversions.add(
+                Plain(*definition["listing-title"]),
+                extra_args=["--syntax-highlighting=none"],
             )
-        )
-        doc.metadata["header-includes"].append(
-            MetaInlines(RawInline(r"\usepackage{etoolbox}", "tex"))
+            for category, definition in listings.items()
+        }
+    else:
+        headers = {
+            category: listing_header(definition)
+            for category, definition in listings.items()
+        }
+        gfm = doc.format == "gfm"
+        for category, definition in listings.items():
+            header = headers[category]
+            if definition["listing-identifier"] is True:
+                header.identifier = unique(
+                    slug(header.content, gfm), doc.identifiers, gfm
+                )
+            elif header.identifier:
+                update_header_identifiers(header, doc)
+    with timed(doc.profile, "conversions"):
+        doc.conversions.run()
+    doc.conversions.close()
+
+    if os.environ.get(STATISTICS):
+        debug(
+            "[INFO] pandoc-numbering: "
+            f"{doc.statistics['numbered']} element(s) numbered, "
+            f"{doc.statistics['parsed']} parsed, "
+            f"{doc.statistics['rejected']} rejected without parsing, "
+            f"{doc.conversions.calls} pandoc call(s)"
         )
 
     i = 0
     listof = []
-    for category, definition in doc.defined.items():
-        if definition["listing-title"] is not None:
-            # pylint: disable=consider-using-f-string
-            if doc.format in {"tex", "latex"}:
-                latex_category = re.sub("[^a-z]+", "", category)
-                text = convert_text(
-                    Plain(*definition["listing-title"]),
-                    input_format="panflute",
-                    output_format="latex",
-                )
-                latex = (
-                    r"\newlistof{%s}{%s}{%s}"
-                    r"\renewcommand{\cft%stitlefont}{\cfttoctitlefont}"
-                    r"\setlength{\cft%snumwidth}{\cftfignumwidth}"
-                    r"\setlength{\cft%sindent}{\cftfigindent}"
-                    % (
-                        latex_category,
-                        latex_category,
-                        text,
-                        latex_category,
-                        latex_category,
-                        latex_category,
-                    )
+    for category, definition in listings.items():
+        # pylint: disable=consider-using-f-string
+        if doc.format in {"tex", "latex"}:
+            latex_category = re.sub("[^a-z]+", "", category)
+            text = titles[category].text
+            latex = (
+                r"\newlistof{%s}{%s}{%s}"
+                r"\renewcommand{\cft%stitlefont}{\cfttoctitlefont}"
+                r"\setlength{\cft%snumwidth}{\cftfignumwidth}"
+                r"\setlength{\cft%sindent}{\cftfigindent}"
+                % (
+                    latex_category,
+                    latex_category,
+                    text,
+                    latex_category,
+                    latex_category,
+                    latex_category,
                 )
-                doc.metadata["header-includes"].append(
-                    MetaInlines(RawInline(latex, "tex"))
+            )
+            doc.metadata["header-includes"].append(MetaInlines(RawInline(latex, "tex")))
+            if definition["listing-identifier"] is False:
+                listof.append(f"\\listof{latex_category}")
+            elif definition["listing-identifier"] is True:
+                listof.append(
+                    f"\\phantomsection\\label{{{Numbered.identifier(text)}}}"
+                    f"\\listof{latex_category}"
                 )
-                if definition["listing-identifier"] is False:
-                    listof.append(f"\\listof{latex_category}")
-                elif definition["listing-identifier"] is True:
-                    listof.append(
-                        f"\\phantomsection\\label{{{Numbered.identifier(text)}}}"
-                        f"\\listof{latex_category}"
-                    )
-                else:
-                    listof.append(
-                        f"\\phantomsection\\label{{{definition['listing-identifier']}}}"
-                        f"\\listof{latex_category}"
-                    )
             else:
-                classes = ["pandoc-numbering-listing"] + definition["classes"]
-
-                if definition["listing-unnumbered"]:
-                    classes.append("unnumbered")
-
-                if definition["listing-unlisted"]:
-                    classes.append("unlisted")
+                listof.append(
+                    f"\\phantomsection\\label{{{definition['listing-identifier']}}}"
+                    f"\\listof{latex_category}"
+                )
+        else:
+            doc.content.insert(i, headers[category])
+            i = i + 1
 
-                if definition["listing-identifier"] is False:
-                    header = Header(
-                        *definition["listing-title"], level=1, classes=classes
-                    )
-                elif definition["listing-identifier"] is True:
-                    header = Header(
-                        *definition["listing-title"], level=1, classes=classes
-                    )
-                    header = convert_text(
-                        convert_text(
-                            header, input_format="panflute", output_format="markdown"
-                        ),
-                        output_format="panflute",
-                    )[0]
-                else:
-                    header = Header(
-                        *definition["listing-title"],
-                        level=1,
-                        classes=classes,
-                        identifier=definition["listing-identifier"],
-                    )
+            table = table_other(doc, category, definition)
 
-                doc.content.insert(i, header)
+            if table:
+                doc.content.insert(i, table)
                 i = i + 1
 
-                table = table_other(doc, category, definition)
-
-                if table:
-                    doc.content.insert(i, table)
-                    i = i + 1
-
     if doc.format in {"tex", "latex"}:
         header = (
             r"\ifdef{\mainmatter}"
@@ -1646,6 +1916,38 @@ def finalize(doc: Doc):
         doc.content.insert(0, Plain(RawInline(latex % "\n".join(listof), "tex")))
 
 
+def listing_header(definition: dict[str, Any]) -> Header:
+    """
+    Compute the header of a listing.
+
+    Arguments
+    ---------
+    definition
+        The category definition
+
+    Returns
+    -------
+    Header
+        The listing header (without its automatic identifier)
+    """
+    classes = ["pandoc-numbering-listing"] + definition["classes"]
+
+    if definition["listing-unnumbered"]:
+        classes.append("unnumbered")
+
+    if definition["listing-unlisted"]:
+        classes.append("unlisted")
+
+    if definition["listing-identifier"] in (False, True):
+        return Header(*definition["listing-title"], level=1, classes=classes)
+    return Header(
+        *definition["listing-title"],
+        level=1,
+        classes=classes,
+        identifier=definition["listing-identifier"],
+    )
+
+
 def table_other(doc: Doc, category: str, _) -> BulletList | None:
     """
     Compute other code for table.
@@ -1694,13 +1996,625 @@ def link_color(doc: Doc) -> str:
     return "\\hypersetup{linkcolor=black}"
 
 
+def sections(doc: Doc) -> list[tuple[int, int]]:
+    """
+    Split the content of a document at its top-level headers.
+
+    Arguments
+    ---------
+    doc
+        pandoc document
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        The start and end indexes of the sections
+    """
+    result = []
+    start = 0
+    for index, block in enumerate(doc.content.list):
+        if index and isinstance(block, Header) and block.level == 1:
+            result.append((start, index))
+            start = index
+    result.append((start, len(doc.content.list)))
+    return result
+
+
+def number_section(start: int, end: int, doc: Doc) -> dict[str, Any]:
+    """
+    Number a section and record its results.
+
+    Arguments
+    ---------
+    start
+        index of the first block of the section
+    end
+        index following the last block of the section
+    doc
+        pandoc document
+
+    Returns
+    -------
+    dict[str, Any]
+        The JSON record of the section
+    """
+    headers = doc.headers[:]
+    aliases = doc.aliases[:]
+    count = dict(doc.count)
+    defined = len(doc.defined)
+    collections = {category: len(tags) for category, tags in doc.collections.items()}
+
+    # Only the blocks containing markers can be modified
+    blocks = {}
+    for index in range(start, end):
+        block = doc.content[index]
+        if isinstance(block, JsonBlock):
+            continue
+        parsed = doc.statistics["parsed"]
+        block.walk(traversing, doc)
+        if doc.statistics["parsed"] != parsed:
+            blocks[str(index - start)] = block.to_json()
+
+    touched = [
+        category for category in doc.count if doc.count[category] != count.get(category)
+    ]
+    return {
+        "headers": headers,
+        "aliases": aliases,
+        "start": {category: count.get(category, 0) for category in touched},
+        "count": {category: doc.count[category] for category in touched},
+        "defined": list(doc.defined)[defined:],
+        "blocks": blocks,
+        "numbered": [
+            [category, doc.information[tag].summary()]
+            for category, tags in doc.collections.items()
+            for tag in tags[collections.get(category, 0) :]
+        ],
+    }
+
+
+def restore_section(record: dict[str, Any], start: int, end: int, doc: Doc) -> bool:
+    """
+    Restore the results of a section numbered by a previous build.
+
+    Arguments
+    ---------
+    record
+        The record of the section, with its elements loaded
+    start
+        index of the first block of the section
+    end
+        index following the last block of the section
+    doc
+        pandoc document
+
+    Returns
+    -------
+    bool
+        False if the numbering of the previous sections has changed
+    """
+    if (
+        record["headers"] != doc.headers
+        or record["aliases"] != doc.aliases
+        or any(doc.count.get(key, 0) != value for key, value in record["start"].items())
+    ):
+        return False
+
+    for index, block in record["blocks"].items():
+        doc.content[start + int(index)] = block
+    for index in range(start, end):
+        if not isinstance(doc.content.list[index], JsonBlock):
+            doc.content[index].walk(replaying, doc)
+
+    for category in record["defined"]:
+        if category not in doc.defined:
+            define(category, doc)
+    doc.count.update(record["count"])
+    for category, summary in record["numbered"]:
+        results = Record(summary)
+        doc.information[results.tag] = results
+        doc.collections.setdefault(category, []).append(results.tag)
+    doc.statistics["numbered"] += len(record["numbered"])
+    return True
+
+
+def replaying(elem: Element, doc: Doc) -> None:
+    """
+    Update the headers and record the elements to reference in a restored section.
+
+    Arguments
+    ---------
+    elem
+        element to record
+    doc
+        pandoc document
+    """
+    if isinstance(elem, (Link, Cite, Span)):
+        if referable(elem, doc):
+            doc.fixups.append(elem)
+    elif isinstance(elem, Header):
+        update_header_numbers(elem, doc)
+        update_header_aliases(elem, doc)
+        update_header_identifiers(elem, doc)
+
+
+def incremental(doc: Doc, state: State) -> None:
+    """
+    Produce the final document, reusing the sections numbered by a previous build.
+
+    A section is reused if its content is unchanged and if the previous
+    sections leave the counters it uses as they were.
+
+    Arguments
+    ---------
+    doc
+        pandoc document
+    state
+        numbering results of the previous build
+    """
+    prepare(doc)
+    doc.metadata.walk(traversing, doc)
+
+    records: list[tuple[str, str | dict[str, Any]]] = []
+    for start, end in sections(doc):
+        key = digest(json_text(block) for block in doc.content.list[start:end])
+        text = state.get(key)
+        if text is not None and restore_section(
+            json.loads(text, object_hook=from_json), start, end, doc
+        ):
+            records.append((key, text))
+        else:
+            records.append((key, number_section(start, end, doc)))
+
+    finalize(doc)
+
+    for key, record in records:
+        if isinstance(record, dict):
+            # The placeholders are replaced by the converted texts
+            substitute(record, doc)
+            record = dumps(record)
+        state.put(key, record)
+    state.save()
+
+    if os.environ.get(STATISTICS):
+        reused = sum(isinstance(record, str) for _, record in records)
+        debug(f"[INFO] pandoc-numbering: {reused} of {len(records)} section(s) reused")
+
+
+def substitute(data: Any, doc: Doc) -> None:
+    """
+    Replace the conversion placeholders in JSON data.
+
+    Arguments
+    ---------
+    data
+        JSON data of elements
+    doc
+        pandoc document
+    """
+    if isinstance(data, list):
+        for item in data:
+            substitute(item, doc)
+    elif isinstance(data, dict):
+        if data.get("t") in ("RawInline", "RawBlock"):
+            data["c"][1] = doc.conversions.substitute(data["c"][1])
+        else:
+            for item in data.values():
+                substitute(item, doc)
+
+
+def counting(elem: Element, doc: Doc) -> None:
+    """
+    Update the header numbers and the counts without numbering the elements.
+
+    Arguments
+    ---------
+    elem
+        element to count
+    doc
+        pandoc document
+    """
+    if isinstance(elem, Header):
+        update_header_numbers(elem, doc)
+        update_header_aliases(elem, doc)
+    elif isinstance(elem, (Para, DefinitionItem)) and marked(elem, doc):
+        content = elem.content if isinstance(elem, Para) else elem.term
+        Numbered(Para(*(clone(item) for item in content)), doc, render=False)
+
+
+def number_part(task: dict[str, Any]) -> str:
+    """
+    Number a section in a worker process.
+
+    Arguments
+    ---------
+    task
+        The api version, the output format, the configuration, the numbering
+        state at the start of the section and the JSON texts of its blocks
+        (None for the blocks kept as JSON text)
+
+    Returns
+    -------
+    str
+        The JSON text of the record of the section
+    """
+    doc = json.loads(
+        dumps(
+            {
+                "pandoc-api-version": task["api-version"],
+                "meta": task["meta"],
+                "blocks": [],
+            }
+        ),
+        object_hook=from_json,
+    )
+    # The blocks kept as JSON text cannot be modified and are not sent
+    doc.content = [
+        JsonBlock("null") if text is None else json.loads(text, object_hook=from_json)
+        for text in task["blocks"]
+    ]
+    doc.format = task["format"]
+    prepare(doc)
+    doc.headers = task["headers"]
+    doc.aliases = task["aliases"]
+    doc.count.update(task["count"])
+    record = number_section(0, len(doc.content), doc)
+    doc.conversions.run()
+    substitute(record, doc)
+    doc.conversions.close()
+    return dumps(record)
+
+
+def use_server(url: str) -> None:
+    """
+    Make a worker process use the pandoc server of the main process.
+
+    Arguments
+    ---------
+    url
+        The URL of the server (empty if no server is available)
+    """
+    os.environ[SERVER] = url
+
+
+def parallel(doc: Doc, jobs: int) -> None:
+    """
+    Produce the final document, numbering its sections in worker processes.
+
+    A quick pass computes the header numbers and the counts at the start of
+    each top-level section. The sections are then numbered in parallel and
+    their records are restored in order. A section whose start state turns
+    out to be wrong is numbered again. The workers share the pandoc server
+    of the main process.
+
+    Arguments
+    ---------
+    doc
+        pandoc document
+    jobs
+        number of worker processes
+    """
+    # concurrent.futures is only imported when processes are requested
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import ProcessPoolExecutor
+
+    meta = doc.metadata.content.to_json()
+    if "pandoc-numbering" in meta:
+        meta = {"pandoc-numbering": meta["pandoc-numbering"]}
+    else:
+        meta = {}
+    parts = sections(doc)
+    tasks = []
+    prepare(doc)
+    doc.metadata.walk(counting, doc)
+    for start, end in parts:
+        tasks.append(
+            {
+                "api-version": list(doc.api_version),
+                "format": doc.format,
+                "meta": meta,
+                "headers": doc.headers[:],
+                "aliases": doc.aliases[:],
+                "count": dict(doc.count),
+                "blocks": [
+                    None if isinstance(block, JsonBlock) else json_text(block)
+                    for block in doc.content.list[start:end]
+                ],
+            }
+        )
+        for block in doc.content.list[start:end]:
+            if not isinstance(block, JsonBlock):
+                block.walk(counting, doc)
+
+    prepare(doc)
+    doc.metadata.walk(traversing, doc)
+    # A local server is started once and shared with the workers: it is
+    # stopped when the conversions of the document are closed
+    initializer, initargs = None, ()
+    if os.environ.get(SERVER):
+        server = Server.from_environment()
+        doc.conversions.server = server
+        initializer, initargs = use_server, (server.url if server else "",)
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=initializer, initargs=initargs
+    ) as executor:
+        for (start, end), text in zip(
+            parts, executor.map(number_part, tasks), strict=True
+        ):
+            if not restore_section(
+                json.loads(text, object_hook=from_json), start, end, doc
+            ):
+                number_section(start, end, doc)
+    finalize(doc)
+
+
+def chapter_index(doc: Doc) -> dict[str, Any]:
+    """
+    Index a chapter of a book.
+
+    Only the headers and the elements which may be numbered are indexed,
+    in the order in which they are numbered.
+
+    Arguments
+    ---------
+    doc
+        pandoc document of the chapter
+
+    Returns
+    -------
+    dict[str, Any]
+        The JSON data of the index
+    """
+    events = []
+
+    def indexing(elem: Element, _) -> None:
+        if isinstance(elem, Header):
+            # The content of a header does not change the numbering
+            events.append(
+                Header(
+                    level=elem.level,
+                    identifier=elem.identifier,
+                    classes=list(elem.classes),
+                ).to_json()
+            )
+        elif isinstance(elem, (Para, DefinitionItem)):
+            content = elem.content if isinstance(elem, Para) else elem.term
+            if content and isinstance(content[-1], Str) and "#" in content[-1].text:
+                events.append({"t": "Para", "c": [item.to_json() for item in content]})
+
+    doc.metadata.walk(indexing, doc)
+    for block in doc.content.list:
+        if not isinstance(block, JsonBlock):
+            block.walk(indexing, doc)
+
+    metadata = doc.metadata.content.to_json()
+    return {
+        "version": BOOK_VERSION,
+        "api-version": list(doc.api_version),
+        "format": doc.format,
+        "numbering": metadata.get("pandoc-numbering"),
+        "events": events,
+    }
+
+
+def merge_indexes(indexes: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Merge the indexes of the chapters of a book.
+
+    The indexed elements are numbered as if the chapters formed a single
+    document. The configuration and the output format of the first chapter
+    are used and the listings of the book are put in its first chapter.
+
+    Arguments
+    ---------
+    indexes
+        The JSON data of the indexes, in chapter order
+
+    Returns
+    -------
+    dict[str, Any]
+        The JSON data of the book
+    """
+    first = indexes[0] if indexes else {}
+    doc = json.loads(
+        dumps(
+            {
+                "pandoc-api-version": first.get("api-version", [1, 23]),
+                "meta": (
+                    {"pandoc-numbering": first["numbering"]}
+                    if first.get("numbering")
+                    else {}
+                ),
+                "blocks": [],
+            }
+        ),
+        object_hook=from_json,
+    )
+    doc.format = first.get("format", "html")
+    prepare(doc)
+
+    chapters = []
+    for data in indexes:
+        chapters.append(
+            [
+                digest(dumps(event) for event in data["events"]),
+                {
+                    "headers": doc.headers[:],
+                    "aliases": doc.aliases[:],
+                    "count": dict(doc.count),
+                    "listings": not chapters,
+                },
+            ]
+        )
+        doc.content = json.loads(dumps(data["events"]), object_hook=from_json)
+        for block in doc.content:
+            block.walk(numbering, doc)
+    doc.content = []
+
+    return {
+        "version": BOOK_VERSION,
+        "chapters": chapters,
+        "numbering": first.get("numbering"),
+        "count": doc.count,
+        "collections": doc.collections,
+        "information": {
+            tag: dumps(record.summary()) for tag, record in doc.information.items()
+        },
+    }
+
+
+def apply(doc: Doc, book: Book) -> None:
+    """
+    Produce the final document of a chapter of a book.
+
+    Arguments
+    ---------
+    doc
+        pandoc document of the chapter
+    book
+        merged indexes of the book
+    """
+    start = book.chapter(digest(dumps(event) for event in chapter_index(doc)["events"]))
+    if start is None:
+        debug("[WARNING] pandoc-numbering: the chapter is not in the book")
+        run_filters([traversing], prepare=prepare, doc=doc, finalize=finalize)
+        return
+
+    # The configuration of the first chapter is used for the whole book
+    prepare(
+        doc,
+        (
+            json.loads(dumps(book.numbering), object_hook=from_json)
+            if book.numbering
+            else MetaMap()
+        ),
+    )
+    doc.headers = start["headers"]
+    doc.aliases = start["aliases"]
+    doc.count.update(start["count"])
+    doc.walk(traversing, doc)
+
+    # The elements numbered in the other chapters
+    tags = [referenced(elem) for elem in doc.fixups]
+    if start["listings"]:
+        # The listings of the whole book are in its first chapter
+        for category, collection in book.collections.items():
+            if category not in doc.defined:
+                define(category, doc)
+            tags.extend(collection)
+        doc.collections = {
+            category: collection[:] for category, collection in book.collections.items()
+        }
+    else:
+        for definition in doc.defined.values():
+            definition["listing-title"] = None
+    for tag in tags:
+        if tag not in doc.information and book.summary(tag) is not None:
+            doc.information[tag] = Record(
+                json.loads(book.summary(tag), object_hook=from_json)
+            )
+            category = tag.split(":", 1)[0]
+            if category not in doc.defined:
+                define(category, doc)
+                doc.defined[category]["listing-title"] = None
+    doc.count.update(book.count)
+    finalize(doc)
+
+
+def referenced(elem: Element) -> str:
+    """
+    Get the tag referenced by an element recorded by traversing.
+
+    Arguments
+    ---------
+    elem
+        a Link, a Cite or a Span
+
+    Returns
+    -------
+    str
+        The tag
+    """
+    if isinstance(elem, Link):
+        return LINK_REGEX.match(elem.url).group("tag")
+    if isinstance(elem, Cite):
+        return CITE_REGEX.match(elem.content[0].text).group("tag")
+    return elem.identifier
+
+
 def main(doc: Doc | None = None) -> None:
     """
     Produce the final document.
 
+    The time spent in each step is reported on the standard error when the
+    ``PANDOC_NUMBERING_PROFILE`` environment variable is set.
+
     Parameters
     ----------
     doc
         pandoc document
     """
-    run_filters([numbering, referencing], prepare=prepare, doc=doc, finalize=finalize)
+    if doc is None:
+        run_filters([traversing], prepare=prepare, finalize=finalize)
+        return
+    profile = getattr(doc, "profile", None)
+    if profile is None:
+        doc.profile = Profile.from_environment()
+    produce(doc)
+    # The entry point which started the profile reports it
+    if profile is None and doc.profile is not None:
+        doc.profile.report(doc)
+
+
+def produce(doc: Doc) -> None:
+    """
+    Produce the final document in the mode configured by the environment.
+
+    The document is numbered as a chapter of a book when the
+    ``PANDOC_NUMBERING_BOOK`` environment variable gives the path of the
+    merged indexes of the book. The numbering results are reused between
+    two builds when the ``PANDOC_NUMBERING_STATE`` environment variable
+    gives the path of a state file. The sections are numbered by several
+    processes when the ``PANDOC_NUMBERING_JOBS`` environment variable is
+    greater than 1.
+
+    Parameters
+    ----------
+    doc
+        pandoc document
+    """
+    if os.environ.get(BOOK):
+        book = Book.from_environment()
+        if book is not None:
+            with timed(doc.profile, "book"):
+                apply(doc, book)
+            return
+    if os.environ.get(STATE):
+        key = [
+            dumps(doc.api_version),
+            doc.format,
+            dumps(doc.metadata.content.to_json()),
+        ]
+        if os.environ.get(MACROS):
+            # The entries are written differently with the macros
+            key.append(MACROS)
+        state = State.from_environment(digest(key))
+        if state is not None:
+            with timed(doc.profile, "state"):
+                incremental(doc, state)
+            return
+    if os.environ.get(JOBS):
+        try:
+            jobs = int(os.environ[JOBS])
+        except ValueError:
+            jobs = 1
+        if jobs > 1 and len(sections(doc)) > 1:
+            with timed(doc.profile, "parallel"):
+                parallel(doc, jobs)
+            return
+    with timed(doc.profile, "prepare"):
+        prepare(doc)
+    with timed(doc.profile, "numbering"):
+        doc.walk(traversing, doc)
+    with timed(doc.profile, "finalize"):
+        finalize(doc)
@@ -0,0 +1,339 @@
+"""Timing of the steps of the filter, reported on the standard error."""
+
+import os
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Any
+
+from panflute import Doc, debug
+
+# Environment variable enabling the report of the time spent in each step
+PROFILE = "PANDOC_NUMBERING_PROFILE"
+
+# Environment variable giving the path of a pstats file written by cProfile
+PROFILE_STATS = "PANDOC_NUMBERING_PROFILE_STATS"
+
+# Environment variable enabling the report of the memory used by each step
+PROFILE_MEMORY = "PANDOC_NUMBERING_PROFILE_MEMORY"
+
+# Number of categories in the report
+TOP = 10
+
+# Attributes referring to the enclosing element rather than to owned data
+_OWNERS = frozenset(("parent",))
+
+# Record attributes holding the rendered template fragments
+_FRAGMENTS = frozenset(("_entry", "_link", "_title", "_description"))
+
+
+class Profile:
+    """
+    Time spent in each step of the filter.
+
+    The time of a step does not include the time of the steps run inside it.
+
+    Arguments
+    ---------
+    stats
+        The path of the pstats file to write or None
+    memory
+        Whether the peak of memory of each step is measured
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    __slots__ = [
+        "_categories",
+        "_conversions",
+        "_mark",
+        "_peaks",
+        "_phases",
+        "_profiler",
+        "_stack",
+        "_started",
+        "_tracemalloc",
+    ]
+
+    def __init__(self, stats: str | None = None, memory: bool = False):
+        self._phases: dict[str, float] = {}
+        self._stack: list[str] = []
+        self._mark = time.perf_counter()
+        self._conversions = [0, 0.0]
+        self._categories: dict[str, list[float]] = {}
+        self._peaks: dict[str, int] = {}
+        self._tracemalloc = None
+        self._started = False
+        self._profiler = None
+        if memory:
+            # tracemalloc is only imported when the memory is measured
+            import tracemalloc  # pylint: disable=import-outside-toplevel
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            self._tracemalloc = tracemalloc
+        if stats:
+            # cProfile is only imported when a pstats file is requested
+            import cProfile  # pylint: disable=import-outside-toplevel
+
+            self._profiler = (cProfile.Profile(), stats)
+            self._profiler[0].enable()
+
+    @classmethod
+    def from_environment(cls) -> "Profile | None":
+        """
+        Start the profile configured by the environment.
+
+        Returns
+        -------
+        Profile | None
+            The profile or None if no profile is requested
+        """
+        memory = bool(os.environ.get(PROFILE_MEMORY))
+        if not (memory or os.environ.get(PROFILE) or os.environ.get(PROFILE_STATS)):
+            return None
+        return cls(os.environ.get(PROFILE_STATS), memory)
+
+    @property
+    def phases(self) -> dict[str, float]:
+        """
+        Get the phases property.
+
+        Returns
+        -------
+        dict[str, float]
+            The time spent in each step (in seconds), in order.
+        """
+        return self._phases
+
+    @property
+    def peaks(self) -> dict[str, int]:
+        """
+        Get the peaks property.
+
+        Returns
+        -------
+        dict[str, int]
+            The peak of traced memory of each step (in bytes), in order, or
+            an empty dictionary if the memory is not measured.
+        """
+        return self._peaks
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Measure a step.
+
+        Arguments
+        ---------
+        name
+            The name of the step
+        """
+        self._switch()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._switch()
+            self._stack.pop()
+
+    def conversion(self, duration: float) -> None:
+        """
+        Record a pandoc call.
+
+        Arguments
+        ---------
+        duration
+            The duration of the call (in seconds)
+        """
+        self._conversions[0] += 1
+        self._conversions[1] += duration
+
+    def numbered(self, category: str, duration: float) -> None:
+        """
+        Record a numbered element.
+
+        Arguments
+        ---------
+        category
+            The category of the element
+        duration
+            The time spent numbering the element (in seconds)
+        """
+        statistics = self._categories.setdefault(category, [0, 0.0])
+        statistics[0] += 1
+        statistics[1] += duration
+
+    def report(self, doc: Doc | None = None) -> None:
+        """
+        Write the report on the standard error and the pstats file.
+
+        Arguments
+        ---------
+        doc
+            The numbered document whose retained memory is reported or None
+        """
+        if self._profiler is not None:
+            profiler, path = self._profiler
+            profiler.disable()
+            try:
+                profiler.dump_stats(path)
+            except OSError as error:
+                debug(f"[WARNING] pandoc-numbering: cannot write {path}: {error}")
+        phases = ", ".join(
+            f"{name} {duration:.3f}s" for name, duration in self._phases.items()
+        )
+        debug(f"[INFO] pandoc-numbering: {phases}")
+        calls, duration = self._conversions
+        debug(f"[INFO] pandoc-numbering: {calls} pandoc call(s) in {duration:.3f}s")
+        categories = sorted(
+            self._categories.items(), key=lambda item: item[1][1], reverse=True
+        )
+        for category, (count, duration) in categories[:TOP]:
+            debug(
+                f"[INFO] pandoc-numbering: {category}: "
+                f"{count} element(s) numbered in {duration:.3f}s"
+            )
+        others = categories[TOP:]
+        if others:
+            count = sum(statistics[0] for _, statistics in others)
+            duration = sum(statistics[1] for _, statistics in others)
+            debug(
+                f"[INFO] pandoc-numbering: {len(others)} other categories: "
+                f"{count} element(s) numbered in {duration:.3f}s"
+            )
+        if self._tracemalloc is not None:
+            self._report_memory(doc)
+
+    def _report_memory(self, doc: Doc | None) -> None:
+        peaks = ", ".join(
+            f"{name} {_bytes(peak)}" for name, peak in self._peaks.items()
+        )
+        debug(f"[INFO] pandoc-numbering: peak memory: {peaks}")
+        if self._started:
+            self._tracemalloc.stop()
+        if doc is None or not hasattr(doc, "information"):
+            return
+        sizes = sorted(
+            retained(doc).items(), key=lambda item: sum(item[1]), reverse=True
+        )
+        for category, (information, fragments, collection) in sizes[:TOP]:
+            debug(
+                f"[INFO] pandoc-numbering: {category}: {_bytes(information)} "
+                f"of information, {_bytes(fragments)} of fragments, "
+                f"{_bytes(collection)} of collection"
+            )
+        others = sizes[TOP:]
+        if others:
+            total = sum(sum(size) for _, size in others)
+            debug(
+                f"[INFO] pandoc-numbering: {len(others)} other categories: "
+                f"{_bytes(total)} retained"
+            )
+
+    def _switch(self) -> None:
+        # Charge the time elapsed since the last switch to the current step
+        now = time.perf_counter()
+        if self._stack:
+            name = self._stack[-1]
+            self._phases[name] = self._phases.get(name, 0.0) + now - self._mark
+            if self._tracemalloc is not None:
+                # The peak of the current step since the last switch
+                peak = self._tracemalloc.get_traced_memory()[1]
+                self._peaks[name] = max(self._peaks.get(name, 0), peak)
+        if self._tracemalloc is not None:
+            self._tracemalloc.reset_peak()
+        self._mark = now
+
+
+def retained(doc: Doc) -> dict[str, tuple[int, int, int]]:
+    """
+    Measure the memory retained by the numbering state of each category.
+
+    An object shared by several categories is only counted once.
+
+    Arguments
+    ---------
+    doc
+        The numbered document
+
+    Returns
+    -------
+    dict[str, tuple[int, int, int]]
+        For each category, the bytes retained by the entries of
+        ``doc.information``, by their rendered template fragments (the
+        entry, the link, the title and the description) and by the tags
+        of ``doc.collections``
+    """
+    seen = {id(doc)}
+    sizes: dict[str, list[int]] = {}
+    for tag, numbered in doc.information.items():
+        size = sizes.setdefault(tag.split(":", 1)[0], [0, 0, 0])
+        size[0] += _sizeof(numbered, seen, _FRAGMENTS)
+        for name in _FRAGMENTS:
+            size[1] += _sizeof(getattr(numbered, name, None), seen)
+    for category, tags in doc.collections.items():
+        sizes.setdefault(category, [0, 0, 0])[2] += _sizeof(tags, seen)
+    return {category: tuple(size) for category, size in sizes.items()}
+
+
+def _sizeof(obj: Any, seen: set[int], skip: frozenset[str] = frozenset()) -> int:
+    # Deep size of an object, without the document it belongs to
+    total = 0
+    stack = [(obj, skip)]
+    while stack:
+        item, ignored = stack.pop()
+        if item is None or id(item) in seen or isinstance(item, type):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            for key, value in item.items():
+                stack.extend(((key, frozenset()), (value, frozenset())))
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend((value, frozenset()) for value in item)
+        else:
+            for name in _slots(type(item)):
+                if name not in _OWNERS and name not in ignored:
+                    stack.append((getattr(item, name, None), frozenset()))
+            if hasattr(item, "__dict__"):
+                stack.append((vars(item), frozenset()))
+    return total
+
+
+def _slots(cls: type) -> list[str]:
+    # The slots declared by a class and by its ancestors
+    return [
+        name
+        for klass in cls.__mro__
+        for name in getattr(klass, "__slots__", ())
+        if isinstance(name, str)
+    ]
+
+
+def _bytes(size: int) -> str:
+    if size < 1048576:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size / 1048576:.1f} MiB"
+
+
+def timed(profile: Profile | None, name: str) -> AbstractContextManager[None]:
+    """
+    Measure a step if a profile is started.
+
+    Arguments
+    ---------
+    profile
+        The profile or None
+    name
+        The name of the step
+
+    Returns
+    -------
+    AbstractContextManager[None]
+        A context measuring the step
+    """
+    if profile is None:
+        return nullcontext()
+    return profile.phase(name)
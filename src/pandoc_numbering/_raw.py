@@ -0,0 +1,63 @@
+"""Raw pandoc JSON input, examined without loading panflute."""
+
+import os
+import sys
+
+# Environment variable enabling the streaming mode
+STREAM = "PANDOC_NUMBERING_STREAM"
+
+# Environment variable giving the path of the merged indexes of a book
+BOOK = "PANDOC_NUMBERING_BOOK"
+
+# Environment variable giving the path of the cache file
+CACHE = "PANDOC_NUMBERING_CACHE"
+
+# Environment variable allowing LaTeX documents to be passed through
+PASSTHROUGH = "PANDOC_NUMBERING_PASSTHROUGH"
+
+# Fragments of the JSON text of the documents which may be modified: a
+# possible marker or link, the metadata of the filter or an escaped character
+_MODIFIABLE = (b"#", b"pandoc-numbering", b"\\u")
+
+
+def default_format() -> str:
+    """
+    Get the output format given by pandoc.
+
+    Returns
+    -------
+    str
+        The first command line argument or html by default
+    """
+    return sys.argv[1] if len(sys.argv) > 1 else "html"
+
+
+def untouched(data: bytes, output_format: str) -> bool:
+    """
+    Tell if a pandoc JSON document can be written back unchanged.
+
+    The LaTeX documents always receive the packages used by the filter in
+    their preamble: they are written back unchanged only if the
+    ``PANDOC_NUMBERING_PASSTHROUGH`` environment variable is set. The
+    chapters of a book are never written back unchanged: they may cite or
+    count the elements of the other chapters, or hold the listings of the
+    book.
+
+    Arguments
+    ---------
+    data
+        The JSON text of the document, encoded in UTF-8
+    output_format
+        The output format
+
+    Returns
+    -------
+    bool
+        True if the document contains no possible marker, no possible
+        reference and no numbering metadata
+    """
+    if os.environ.get(BOOK):
+        return False
+    if output_format in {"tex", "latex"} and not os.environ.get(PASSTHROUGH):
+        return False
+    return not any(fragment in data for fragment in _MODIFIABLE)
@@ -0,0 +1,384 @@
+"""Compact results of the numbered elements."""
+
+import sys
+from typing import Any
+
+from panflute import Element, RawInline, Span, Str, stringify
+
+from ._template import clone, lowering
+
+# Results of a numbered element computed by the numbering
+FIELDS = (
+    "tag",
+    "category",
+    "global_number",
+    "section_number",
+    "local_number",
+    "section_alias",
+    "alias",
+    "title",
+    "description",
+)
+
+
+def plain_text(inlines: list[Element] | tuple[Element, ...]) -> str:
+    """
+    Stringify a list of inlines.
+
+    Arguments
+    ---------
+    inlines
+        The inlines
+
+    Returns
+    -------
+    str
+        The text of the inlines
+    """
+    return "".join(map(stringify, inlines))
+
+
+class Record:
+    """
+    Results of a numbered element used by the references and the listings.
+
+    A record is immutable. Its strings are computed once, when the element is
+    numbered. Its link, entry and caption are rendered from the definition
+    of its category on first access, then shared by all the references.
+
+    Arguments
+    ---------
+    results
+        The results of the element, as given by ``summary``, without the
+        link, the entry and the caption when a definition is given
+    texts
+        The text of the title and of the description if already known
+    definition
+        The definition of the category rendering the fragments or None
+    latex
+        Whether the caption is rendered for LaTeX
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    __slots__ = [
+        "_alias",
+        "_caption",
+        "_category",
+        "_definition",
+        "_description",
+        "_description_lower",
+        "_description_text",
+        "_entry",
+        "_global_number",
+        "_latex",
+        "_link",
+        "_local_number",
+        "_section_alias",
+        "_section_number",
+        "_tag",
+        "_title",
+        "_title_lower",
+        "_title_text",
+    ]
+
+    def __init__(
+        self,
+        results: dict[str, Any],
+        texts: tuple[str, str] | None = None,
+        definition: dict[str, Any] | None = None,
+        latex: bool = False,
+    ):
+        self._tag = results["tag"]
+        # The strings shared by the elements of a section are stored once
+        self._category = sys.intern(results["category"])
+        self._caption = results.get("caption")
+        self._global_number = results["global_number"]
+        self._section_number = sys.intern(results["section_number"])
+        self._local_number = results["local_number"]
+        self._section_alias = sys.intern(results["section_alias"])
+        self._alias = results["alias"]
+        self._title = tuple(results["title"])
+        self._description = tuple(results["description"])
+        self._link = results.get("link")
+        self._entry = results.get("entry")
+        self._definition = definition
+        self._latex = latex
+        if texts is None:
+            texts = (plain_text(self._title), plain_text(self._description))
+        self._title_text, self._description_text = texts
+        self._title_lower = _lower(self._title_text)
+        self._description_lower = _lower(self._description_text)
+
+    @property
+    def tag(self) -> str:
+        """
+        Get the tag property.
+
+        Returns
+        -------
+        str
+            The tag property.
+        """
+        return self._tag
+
+    @property
+    def category(self) -> str:
+        """
+        Get the category property.
+
+        Returns
+        -------
+        str
+            The category property.
+        """
+        return self._category
+
+    @property
+    def caption(self) -> str:
+        """
+        Get the caption property.
+
+        Returns
+        -------
+        str
+            The caption property (with %c not yet replaced).
+        """
+        if self._caption is None:
+            self._caption = self._render_caption()
+        return self._caption
+
+    @property
+    def global_number(self) -> str:
+        """
+        Get the global_number property.
+
+        Returns
+        -------
+        str
+            The global_number property.
+        """
+        return self._global_number
+
+    @property
+    def section_number(self) -> str:
+        """
+        Get the section_number property.
+
+        Returns
+        -------
+        str
+            The section_number property.
+        """
+        return self._section_number
+
+    @property
+    def local_number(self) -> str:
+        """
+        Get the local_number property.
+
+        Returns
+        -------
+        str
+            The local_number property.
+        """
+        return self._local_number
+
+    @property
+    def section_alias(self) -> str:
+        """
+        Get the section_alias property.
+
+        Returns
+        -------
+        str
+            The section_alias property.
+        """
+        return self._section_alias
+
+    @property
+    def alias(self) -> str:
+        """
+        Get the alias property.
+
+        Returns
+        -------
+        str
+            The alias property.
+        """
+        return self._alias
+
+    @property
+    def title(self) -> tuple[Element, ...]:
+        """
+        Get the title property.
+
+        Returns
+        -------
+        tuple[Element, ...]
+            The title property.
+        """
+        return self._title
+
+    @property
+    def description(self) -> tuple[Element, ...]:
+        """
+        Get the description property.
+
+        Returns
+        -------
+        tuple[Element, ...]
+            The description property.
+        """
+        return self._description
+
+    @property
+    def title_text(self) -> str:
+        """
+        Get the title_text property.
+
+        Returns
+        -------
+        str
+            The text of the title.
+        """
+        return self._title_text
+
+    @property
+    def description_text(self) -> str:
+        """
+        Get the description_text property.
+
+        Returns
+        -------
+        str
+            The text of the description.
+        """
+        return self._description_text
+
+    @property
+    def title_lower(self) -> str:
+        """
+        Get the title_lower property.
+
+        Returns
+        -------
+        str
+            The text of the title in lower case.
+        """
+        return self._title_lower
+
+    @property
+    def description_lower(self) -> str:
+        """
+        Get the description_lower property.
+
+        Returns
+        -------
+        str
+            The text of the description in lower case.
+        """
+        return self._description_lower
+
+    @property
+    def link(self) -> Span:
+        """
+        Get the link property.
+
+        Returns
+        -------
+        Span
+            The rendered content of the references.
+        """
+        if self._link is None:
+            self._link = self._render("link")
+        return self._link
+
+    @property
+    def entry(self) -> Span:
+        """
+        Get the entry property.
+
+        Returns
+        -------
+        Span
+            The rendered content of the listing entry.
+        """
+        if self._entry is None:
+            self._entry = self._render("entry")
+        return self._entry
+
+    def values(self) -> dict[str, list[Element]]:
+        """
+        Get the values of the placeholders referring to the element.
+
+        Returns
+        -------
+        dict[str, list[Element]]
+            New elements replacing each placeholder (but %c)
+        """
+        return {
+            "%D": list(self._description),
+            "%d": [clone(item).walk(lowering) for item in self._description],
+            "%T": list(self._title),
+            "%t": [clone(item).walk(lowering) for item in self._title],
+            "%g": [Str(self._global_number)],
+            "%s": [Str(self._section_number)],
+            "%n": [Str(self._local_number)],
+            "#": [Str(self._local_number)],
+            "%p": [RawInline("\\pageref{" + self._tag + "}", "tex")],
+        }
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Summarize the results used by the references and the listings.
+
+        Returns
+        -------
+        dict[str, Any]
+            The JSON data of the results
+        """
+        return {
+            "tag": self._tag,
+            "category": self._category,
+            "caption": self.caption,
+            "global_number": self._global_number,
+            "section_number": self._section_number,
+            "local_number": self._local_number,
+            "section_alias": self._section_alias,
+            "alias": self._alias,
+            "title": [item.to_json() for item in self._title],
+            "description": [item.to_json() for item in self._description],
+            "link": self.link.to_json(),
+            "entry": self.entry.to_json(),
+        }
+
+    def _render(self, kind: str) -> Span:
+        variant = "title" if self._title else "classic"
+        return Span(
+            *self._definition["templates"][f"format-{kind}-{variant}"].render(
+                self.values()
+            ),
+            classes=[f"pandoc-numbering-{kind}"] + self._definition["classes"],
+        )
+
+    def _render_caption(self) -> str:
+        # The %c placeholder is replaced by the references
+        variant = "title" if self._title else "classic"
+        caption = self._definition["format-caption-" + variant]
+        caption = caption.replace("%t", self._title_lower)
+        caption = caption.replace("%T", self._title_text)
+        caption = caption.replace("%d", self._description_lower)
+        caption = caption.replace("%D", self._description_text)
+        caption = caption.replace("%s", self._section_number)
+        caption = caption.replace("%g", self._global_number)
+        caption = caption.replace("%n", self._local_number)
+        caption = caption.replace("#", self._local_number)
+        if self._latex:
+            caption = caption.replace("%p", "\\pageref{" + self._tag + "}")
+        return caption
+
+
+def _lower(string: str) -> str:
+    # Share the string when it is already in lower case
+    lower = string.lower()
+    return string if lower == string else lower
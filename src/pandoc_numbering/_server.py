@@ -0,0 +1,189 @@
+"""Client of a long-lived pandoc server."""
+
+# socket and urllib are only imported when a server is configured
+# pylint: disable=import-outside-toplevel
+
+import json
+import os
+import subprocess
+import time
+from typing import Any
+
+# Environment variable enabling the pandoc server (a URL or any other value
+# to start a local server)
+SERVER = "PANDOC_NUMBERING_SERVER"
+
+# Seconds allowed for starting a local server
+STARTUP = 5.0
+
+# Seconds allowed for a conversion
+TIMEOUT = 60.0
+
+
+class Server:
+    """
+    Pandoc server speaking the JSON protocol of ``pandoc server``.
+
+    Arguments
+    ---------
+    url
+        The URL of the server
+    process
+        The local process running the server
+    """
+
+    __slots__ = ["_process", "_url"]
+
+    def __init__(self, url: str, process: subprocess.Popen | None = None):
+        self._url = url.rstrip("/")
+        self._process = process
+
+    @classmethod
+    def from_environment(cls) -> "Server | None":
+        """
+        Connect to the server configured by the environment.
+
+        Returns
+        -------
+        Server | None
+            The server or None if no server is configured or available
+        """
+        value = os.environ.get(SERVER)
+        if not value:
+            return None
+        if value.startswith(("http://", "https://")):
+            return cls(value)
+        return cls.start()
+
+    @classmethod
+    def start(cls) -> "Server | None":
+        """
+        Start a local server.
+
+        Returns
+        -------
+        Server | None
+            The server or None if it cannot be started
+        """
+        import socket
+        import urllib.request
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        try:
+            # pylint: disable=consider-using-with
+            process = subprocess.Popen(
+                ["pandoc", "server", "--port", str(port)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError:
+            return None
+        server = cls(f"http://127.0.0.1:{port}", process)
+        deadline = time.monotonic() + STARTUP
+        while time.monotonic() < deadline and process.poll() is None:
+            try:
+                with urllib.request.urlopen(server.url + "/version", timeout=1):
+                    return server
+            except OSError:
+                time.sleep(0.05)
+        server.close()
+        return None
+
+    @property
+    def url(self) -> str:
+        """
+        Get the url property.
+
+        Returns
+        -------
+        str
+            The URL of the server.
+        """
+        return self._url
+
+    def convert(
+        self,
+        text: str,
+        input_format: str,
+        output_format: str,
+        extra_args: list[str] | None = None,
+    ) -> str | None:
+        """
+        Convert a text.
+
+        Arguments
+        ---------
+        text
+            The text to convert
+        input_format
+            The input format
+        output_format
+            The output format
+        extra_args
+            Extra arguments, as they would be given to pandoc
+
+        Returns
+        -------
+        str | None
+            The converted text or None if the server failed
+        """
+        import urllib.request
+
+        data = {"text": text, "from": input_format, "to": output_format}
+        data.update(options(extra_args or []))
+        request = urllib.request.Request(
+            self._url,
+            data=json.dumps(data).encode("utf-8"),
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+            },
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+                result = json.loads(response.read().decode("utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(result, dict) or result.get("base64"):
+            return None
+        output = result.get("output")
+        if not isinstance(output, str):
+            return None
+        # Like convert_text, remove the final line break
+        return output.rstrip("\n")
+
+    def close(self) -> None:
+        """
+        Stop the local process running the server.
+        """
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=STARTUP)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process = None
+
+
+def options(extra_args: list[str]) -> dict[str, Any]:
+    """
+    Convert pandoc command line arguments to server options.
+
+    Arguments
+    ---------
+    extra_args
+        Long options such as ``--syntax-highlighting=none``
+
+    Returns
+    -------
+    dict[str, Any]
+        The server options
+    """
+    result: dict[str, Any] = {}
+    for arg in extra_args:
+        name, equal, value = arg.removeprefix("--").partition("=")
+        result[name] = value if equal else True
+    return result
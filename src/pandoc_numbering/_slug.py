@@ -0,0 +1,177 @@
+"""Identifiers computed the way pandoc does for headers."""
+
+import unicodedata
+from collections.abc import Iterable
+from functools import lru_cache
+
+from panflute import (
+    Code,
+    Element,
+    LineBreak,
+    Math,
+    Note,
+    Quoted,
+    RawInline,
+    SoftBreak,
+    Space,
+    Span,
+    Str,
+)
+
+# Maximal number of slugs kept in memory
+CACHE_SIZE = 4096
+
+# Characters considered as spaces by Haskell (besides the Zs category)
+_SPACES = frozenset("\t\n\v\f\r ")
+
+# Categories of the extra characters kept by gfm_auto_identifiers
+_GFM_CATEGORIES = frozenset(("Mn", "Mc", "Me", "Pc"))
+
+
+def slug(elems: Iterable[Element], gfm: bool = False) -> str:
+    """
+    Compute the automatic identifier of a list of inline elements.
+
+    Arguments
+    ---------
+    elems
+        The inline elements (usually the content of a header)
+    gfm
+        Use the gfm_auto_identifiers extension instead of auto_identifiers
+
+    Returns
+    -------
+    str
+        The identifier (which can be empty)
+    """
+    return slugify(text(elems, gfm), gfm)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def slugify(string: str, gfm: bool = False) -> str:
+    """
+    Compute the automatic identifier of a string.
+
+    Arguments
+    ---------
+    string
+        The string
+    gfm
+        Use the gfm_auto_identifiers extension instead of auto_identifiers
+
+    Returns
+    -------
+    str
+        The identifier (which can be empty)
+    """
+    string = string.lower()
+    if gfm:
+        return "".join(
+            "-" if _is_space(char) else char
+            for char in string
+            if _is_space(char) or _is_alnum(char) or _is_gfm_punct(char)
+        )
+
+    string = "".join(
+        char for char in string if _is_space(char) or _is_alnum(char) or char in "_-."
+    )
+    words = "".join(" " if _is_space(char) else char for char in string).split()
+    string = "-".join(words)
+
+    # Remove the leading characters that are not letters
+    for index, char in enumerate(string):
+        if unicodedata.category(char).startswith("L"):
+            return string[index:]
+    return ""
+
+
+def unique(identifier: str, used: dict[str, int], gfm: bool = False) -> str:
+    """
+    Make an identifier unique.
+
+    Arguments
+    ---------
+    identifier
+        The identifier (which can be empty)
+    used
+        The number of uses of the identifiers. It is updated.
+    gfm
+        Use the gfm_auto_identifiers extension instead of auto_identifiers
+
+    Returns
+    -------
+    str
+        The unique identifier
+    """
+    if gfm:
+        # Like GitHub, count the uses of each identifier
+        number = used.get(identifier, 0)
+        used[identifier] = number + 1
+        return f"{identifier}-{number}" if number else identifier
+
+    identifier = identifier or "section"
+    result = identifier
+    number = 0
+    while result in used:
+        number += 1
+        result = f"{identifier}-{number}"
+    used[result] = 1
+    return result
+
+
+def text(elems: Iterable[Element], gfm: bool = False) -> str:
+    """
+    Convert inline elements to plain text like pandoc does.
+
+    Arguments
+    ---------
+    elems
+        The inline elements
+    gfm
+        Replace the emojis by their names as gfm_auto_identifiers does
+
+    Returns
+    -------
+    str
+        The plain text
+    """
+    return "".join(_text(elem, gfm) for elem in elems)
+
+
+def _text(elem: Element, gfm: bool) -> str:
+    # pylint: disable=too-many-return-statements
+    if isinstance(elem, Str):
+        return elem.text
+    if isinstance(elem, (Space, SoftBreak, LineBreak)):
+        return " "
+    if isinstance(elem, (Code, Math)):
+        return elem.text
+    if isinstance(elem, (RawInline, Note)):
+        return ""
+    if isinstance(elem, Quoted):
+        if elem.quote_type == "DoubleQuote":
+            return "“" + text(elem.content, gfm) + "”"
+        return "‘" + text(elem.content, gfm) + "’"
+    if (
+        gfm
+        and isinstance(elem, Span)
+        and not elem.identifier
+        and elem.classes == ["emoji"]
+        and list(elem.attributes) == ["data-emoji"]
+    ):
+        return elem.attributes["data-emoji"]
+    if hasattr(elem, "content"):
+        return text(elem.content, gfm)
+    return ""
+
+
+def _is_space(char: str) -> bool:
+    return char in _SPACES or unicodedata.category(char) == "Zs"
+
+
+def _is_alnum(char: str) -> bool:
+    return unicodedata.category(char)[0] in "LN"
+
+
+def _is_gfm_punct(char: str) -> bool:
+    return char in "-_" or unicodedata.category(char) in _GFM_CATEGORIES
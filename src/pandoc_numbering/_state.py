@@ -0,0 +1,137 @@
+"""Numbering results of the sections, persisted between two builds."""
+
+import json
+import os
+from collections.abc import Iterable
+
+from panflute import debug
+
+# Environment variable giving the path of the state file
+STATE = "PANDOC_NUMBERING_STATE"
+
+# Version of the format of the state file
+VERSION = 1
+
+
+class State:
+    """
+    Numbering results of the top-level sections, keyed by the digest of their
+    content.
+
+    The file starts with a header line giving the version and the key of the
+    build. Each following line holds the digest of a section and its JSON
+    record.
+
+    Arguments
+    ---------
+    path
+        The path of the state file
+    key
+        The key of the build (the records of another build are ignored)
+    """
+
+    __slots__ = ["_key", "_path", "_records", "_saved"]
+
+    def __init__(self, path: str, key: str):
+        self._path = path
+        self._key = key
+        self._records: dict[str, str] = {}
+        self._saved: dict[str, str] = {}
+        try:
+            with open(path, encoding="utf-8") as file:
+                header = json.loads(file.readline() or "{}")
+                if header.get("version") == VERSION and header.get("key") == key:
+                    for line in file:
+                        section, _, text = line.rstrip("\n").partition(" ")
+                        self._records[section] = text
+        except (OSError, ValueError, AttributeError):
+            self._records = {}
+
+    @classmethod
+    def from_environment(cls, key: str) -> "State | None":
+        """
+        Open the state file configured by the environment.
+
+        Arguments
+        ---------
+        key
+            The key of the build
+
+        Returns
+        -------
+        State | None
+            The state or None if no state file is configured
+        """
+        path = os.environ.get(STATE)
+        if not path:
+            return None
+        return cls(path, key)
+
+    def get(self, section: str) -> str | None:
+        """
+        Get the record of a section.
+
+        Arguments
+        ---------
+        section
+            The digest of the section
+
+        Returns
+        -------
+        str | None
+            The JSON text of the record or None if it is unknown
+        """
+        return self._records.get(section)
+
+    def put(self, section: str, text: str) -> None:
+        """
+        Keep the record of a section for the next build.
+
+        Arguments
+        ---------
+        section
+            The digest of the section
+        text
+            The JSON text of the record (without line breaks)
+        """
+        self._saved[section] = text
+
+    def save(self) -> None:
+        """
+        Write the records kept for the next build.
+
+        The records of the sections which no longer exist are dropped.
+        """
+        temporary = self._path + ".tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8", newline="\n") as file:
+                file.write(json.dumps({"version": VERSION, "key": self._key}) + "\n")
+                file.writelines(
+                    section + " " + text + "\n" for section, text in self._saved.items()
+                )
+            os.replace(temporary, self._path)
+        except OSError as error:
+            debug(f"[WARNING] pandoc-numbering: cannot save the state file: {error}")
+
+
+def digest(texts: Iterable[str]) -> str:
+    """
+    Compute the digest of a sequence of texts.
+
+    Arguments
+    ---------
+    texts
+        The texts
+
+    Returns
+    -------
+    str
+        The hexadecimal SHA-256 digest
+    """
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    sha = hashlib.sha256()
+    for text in texts:
+        sha.update(text.encode("utf-8"))
+        sha.update(b"\n")
+    return sha.hexdigest()
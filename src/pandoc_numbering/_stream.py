@@ -0,0 +1,352 @@
+"""Loading and streaming of pandoc JSON documents."""
+
+import io
+import json
+import sys
+from collections.abc import Iterable, Iterator
+from typing import TextIO
+
+from panflute import Doc, Element, RawBlock, RawInline
+from panflute.elements import from_json
+
+from ._block import JsonBlock, dumps, json_text
+from ._convert import PLACEHOLDER
+from ._main import finalize, prepare, referencing, traversing
+from ._profile import Profile, timed
+from ._raw import default_format
+
+# Number of characters read at once
+CHUNK = 1 << 16
+
+# JSON whitespace
+_WHITESPACE = " \t\n\r"
+
+# Fragments of the JSON text of the blocks which have to be loaded: a
+# possible marker or link, a header, a citation, a span or an escaped
+# character
+_NEEDED = ("#", '"Header"', '"Cite"', '"Span"', "\\u")
+
+# Marks of the spilled blocks
+_COPY = "0"
+_REFERENCE = "1"
+
+
+class Reader:
+    """
+    Incremental reader of a JSON text.
+
+    Only the values which are strings, arrays or objects can be read: a
+    truncated number could be mistaken for a complete one.
+
+    Arguments
+    ---------
+    source
+        The text stream to read
+    """
+
+    __slots__ = ["_buffer", "_decoder", "_eof", "_position", "_source"]
+
+    def __init__(self, source: TextIO):
+        self._source = source
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def peek(self) -> str:
+        """
+        Skip the whitespace and get the next character.
+
+        Returns
+        -------
+        str
+            The next character or an empty string at the end of the stream
+        """
+        while True:
+            while (
+                self._position < len(self._buffer)
+                and self._buffer[self._position] in _WHITESPACE
+            ):
+                self._position += 1
+            if self._position < len(self._buffer) or not self._read(CHUNK):
+                return self._buffer[self._position : self._position + 1]
+
+    def expect(self, char: str) -> None:
+        """
+        Consume the next character.
+
+        Arguments
+        ---------
+        char
+            The expected character
+
+        Raises
+        ------
+        ValueError
+            If the next character is not the expected one
+        """
+        if self.peek() != char:
+            raise ValueError(f"'{char}' expected at character {self._position}")
+        self._position += 1
+
+    def value(self) -> str:
+        """
+        Consume the next value.
+
+        Returns
+        -------
+        str
+            The JSON text of the value
+        """
+        self.peek()
+        while True:
+            try:
+                _, end = self._decoder.raw_decode(self._buffer, self._position)
+                break
+            except json.JSONDecodeError:
+                # The value may be truncated: read as much again
+                if not self._read(max(CHUNK, len(self._buffer) - self._position)):
+                    raise
+        text = self._buffer[self._position : end]
+        self._position = end
+        return text
+
+    def array(self) -> Iterator[str]:
+        """
+        Consume the next array, value by value.
+
+        Yields
+        ------
+        str
+            The JSON text of each value
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self._position += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == "]":
+                self._position += 1
+                return
+            self.expect(",")
+
+    def _read(self, size: int) -> bool:
+        if self._eof:
+            return False
+        data = self._source.read(size)
+        if not data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._position :] + data
+        self._position = 0
+        return True
+
+
+def needed(text: str) -> bool:
+    """
+    Tell if a top-level block has to be loaded.
+
+    Arguments
+    ---------
+    text
+        The JSON text of the block
+
+    Returns
+    -------
+    bool
+        False if the block contains no header, no possible marker and no
+        possible reference
+    """
+    return any(fragment in text for fragment in _NEEDED)
+
+
+def load(input_stream: TextIO | None = None, output_format: str | None = None) -> Doc:
+    """
+    Load a pandoc JSON document, leaving the useless blocks as JSON text.
+
+    Arguments
+    ---------
+    input_stream
+        The stream of the JSON document (standard input by default)
+    output_format
+        The output format (the first command line argument by default)
+
+    Returns
+    -------
+    Doc
+        The document
+    """
+    parts, blocks = _header(Reader(input_stream or _stdin()))
+    doc = _document(parts, output_format)
+    doc.content = [
+        json.loads(text, object_hook=from_json) if needed(text) else JsonBlock(text)
+        for text in blocks
+    ]
+    return doc
+
+
+def dump(doc: Doc, output_stream: TextIO | None = None) -> None:
+    """
+    Write a document as pandoc JSON.
+
+    Arguments
+    ---------
+    doc
+        The document
+    output_stream
+        The stream of the JSON result (standard output by default)
+    """
+    _write(doc, (), output_stream or _stdout())
+
+
+def stream(
+    input_stream: TextIO | None = None,
+    output_stream: TextIO | None = None,
+    output_format: str | None = None,
+) -> None:
+    """
+    Number a pandoc JSON document without loading it entirely.
+
+    The top-level blocks are numbered as they are read and spilled to a
+    temporary file. They are streamed back out once all the elements are
+    numbered, and only the blocks which may contain references are loaded
+    again to be patched.
+
+    Arguments
+    ---------
+    input_stream
+        The stream of the JSON document (standard input by default)
+    output_stream
+        The stream of the JSON result (standard output by default)
+    output_format
+        The output format (the first command line argument by default)
+    """
+    import tempfile  # pylint: disable=import-outside-toplevel
+
+    profile = Profile.from_environment()
+    with timed(profile, "load"):
+        parts, blocks = _header(Reader(input_stream or _stdin()))
+        doc = _document(parts, output_format)
+    doc.profile = profile
+
+    with timed(profile, "prepare"):
+        prepare(doc)
+    with timed(profile, "numbering"):
+        doc.metadata.walk(traversing, doc)
+    fixups = doc.fixups
+    doc.fixups = []
+
+    with tempfile.TemporaryFile("w+", encoding="utf-8", newline="\n") as spill:
+        # The blocks are read as they are numbered
+        with timed(profile, "numbering"):
+            for text in blocks:
+                spill.write(_number(text, doc))
+        doc.fixups = fixups
+        with timed(profile, "finalize"):
+            finalize(doc)
+            doc.metadata.walk(lambda elem, _: _substitute(elem, doc), doc)
+        spill.seek(0)
+        with timed(profile, "dump"):
+            _write(
+                doc,
+                (_reference(line, doc) for line in spill),
+                output_stream or _stdout(),
+            )
+    if profile is not None:
+        profile.report(doc)
+
+
+def _stdin() -> TextIO:
+    return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+
+
+def _stdout() -> TextIO:
+    return io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+
+
+def _document(parts: dict[str, str], output_format: str | None) -> Doc:
+    doc = json.loads(
+        '{"pandoc-api-version":'
+        + parts.get("pandoc-api-version", "[1,23]")
+        + ',"meta":'
+        + parts.get("meta", "{}")
+        + ',"blocks":[]}',
+        object_hook=from_json,
+    )
+    doc.format = default_format() if output_format is None else output_format
+    return doc
+
+
+def _write(doc: Doc, tail: Iterable[str], output_stream: TextIO) -> None:
+    # The blocks of the document are followed by the JSON texts of tail
+    output_stream.write('{"pandoc-api-version":')
+    output_stream.write(dumps(doc.api_version))
+    output_stream.write(',"meta":')
+    output_stream.write(dumps(doc.metadata.content.to_json()))
+    output_stream.write(',"blocks":[')
+    separator = ""
+    for block in doc.content:
+        output_stream.write(separator + json_text(block))
+        separator = ","
+    for text in tail:
+        output_stream.write(separator + text)
+        separator = ","
+    output_stream.write("]}")
+    output_stream.flush()
+
+
+def _header(reader: Reader) -> tuple[dict[str, str], Iterator[str]]:
+    # Read the document up to its blocks, as long as the metadata are known
+    parts: dict[str, str] = {}
+    reader.expect("{")
+    while reader.peek() != "}":
+        key = json.loads(reader.value())
+        reader.expect(":")
+        if key == "blocks" and "meta" in parts:
+            return parts, reader.array()
+        parts[key] = reader.value()
+        if reader.peek() != "}":
+            reader.expect(",")
+    # The blocks came before the metadata: they are already in memory
+    return parts, Reader(io.StringIO(parts.pop("blocks", "[]"))).array()
+
+
+def _number(text: str, doc: Doc) -> str:
+    if not needed(text):
+        return _COPY + text.replace("\n", " ") + "\n"
+    parsed = doc.statistics["parsed"]
+    block = _load(text, doc)
+    block.walk(traversing, doc)
+    mark = _REFERENCE if doc.fixups else _COPY
+    if doc.statistics["parsed"] != parsed:
+        # The block may have been modified
+        text = dumps(block.to_json())
+    doc.fixups = []
+    doc.conversions.forget()
+    doc.content = []
+    # JSON strings cannot contain raw line breaks
+    return mark + text.replace("\n", " ") + "\n"
+
+
+def _reference(line: str, doc: Doc) -> str:
+    text = line[1:].rstrip("\n")
+    if line[0] == _COPY and PLACEHOLDER not in text:
+        return text
+    block = _load(text, doc)
+    if line[0] == _REFERENCE:
+        block = block.walk(referencing, doc)
+    block.walk(lambda elem, _: _substitute(elem, doc), doc)
+    doc.content = []
+    return dumps(block.to_json())
+
+
+def _load(text: str, doc: Doc) -> Element:
+    # The block is the only content of the document while it is processed
+    doc.content = [json.loads(text, object_hook=from_json)]
+    return doc.content[0]
+
+
+def _substitute(elem: Element, doc: Doc) -> None:
+    if isinstance(elem, (RawInline, RawBlock)) and PLACEHOLDER in elem.text:
+        elem.text = doc.conversions.substitute(elem.text)
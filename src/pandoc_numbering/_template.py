@@ -0,0 +1,451 @@
+"""Format templates compiled into render plans."""
+
+import copy
+import re
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
+
+from panflute import (
+    Element,
+    Emph,
+    Image,
+    LineBreak,
+    Link,
+    Plain,
+    Quoted,
+    SmallCaps,
+    SoftBreak,
+    Space,
+    Span,
+    Str,
+    Strikeout,
+    Strong,
+    Subscript,
+    Superscript,
+    Underline,
+)
+
+# Inline elements whose children are all in their content
+_CONTAINERS = (
+    Emph,
+    Image,
+    Link,
+    Quoted,
+    SmallCaps,
+    Span,
+    Strikeout,
+    Strong,
+    Subscript,
+    Superscript,
+    Underline,
+)
+
+# Inline elements without any attribute
+_LEAVES = frozenset((LineBreak, SoftBreak, Space))
+
+# Kinds of steps in a plan
+_STATIC = 0
+_TEXT = 1
+_CONTAINER = 2
+_WALK = 3
+
+
+class Template:
+    """
+    Format template compiled into a render plan.
+
+    The placeholders are replaced as if each of them was replaced in turn in
+    the whole template: the value of a placeholder is itself subject to the
+    replacement of the following placeholders.
+
+    Arguments
+    ---------
+    elems
+        The inline elements of the template
+    keys
+        The placeholders, in replacement order
+    """
+
+    __slots__ = ["_elems", "_keys", "_placeholders", "_plan"]
+
+    def __init__(self, elems: Iterable[Element], keys: Sequence[str]):
+        self._elems = list(elems)
+        self._keys = tuple(keys)
+        self._plan = _compile(self._elems, self._keys, 0)
+        self._placeholders = tuple(
+            key for key in self._keys if contains(self._elems, (key,))
+        )
+
+    @property
+    def keys(self) -> tuple[str, ...]:
+        """
+        Get the keys property.
+
+        Returns
+        -------
+        tuple[str, ...]
+            The placeholders, in replacement order.
+        """
+        return self._keys
+
+    @property
+    def placeholders(self) -> tuple[str, ...]:
+        """
+        Get the placeholders property.
+
+        Returns
+        -------
+        tuple[str, ...]
+            The placeholders written in the template, in replacement order.
+        """
+        return self._placeholders
+
+    @property
+    def bare(self) -> str | None:
+        """
+        Get the bare property.
+
+        Returns
+        -------
+        str | None
+            The placeholder making up the whole template or None.
+        """
+        if (
+            len(self._elems) == 1
+            and type(self._elems[0]) is Str  # pylint: disable=unidiomatic-typecheck
+            and self._elems[0].text in self._keys
+        ):
+            return self._elems[0].text
+        return None
+
+    def render(self, values: dict[str, list[Element]]) -> list[Element]:
+        """
+        Render the template.
+
+        Arguments
+        ---------
+        values
+            The elements replacing each placeholder
+
+        Returns
+        -------
+        list[Element]
+            New inline elements
+        """
+        if _recursive(self._keys, values):
+            plain = Plain(*[clone(elem) for elem in self._elems])
+            _replace_sequential(plain, self._keys, values)
+            return list(plain.content)
+        return _render(self._plan, _Values(self._keys, values))
+
+
+class _Values:
+    """
+    Values of the placeholders during a rendering.
+    """
+
+    __slots__ = ["_keys", "_plans", "_values"]
+
+    def __init__(self, keys: tuple[str, ...], values: dict[str, list[Element]]):
+        self._keys = keys
+        self._values = values
+        self._plans: dict[int, list[tuple]] = {}
+
+    @property
+    def keys(self) -> tuple[str, ...]:
+        """
+        Get the keys property.
+
+        Returns
+        -------
+        tuple[str, ...]
+            The placeholders, in replacement order.
+        """
+        return self._keys
+
+    def fill(self, index: int) -> list[Element]:
+        """
+        Render the value of a placeholder.
+
+        Arguments
+        ---------
+        index
+            The index of the placeholder
+
+        Returns
+        -------
+        list[Element]
+            New inline elements
+        """
+        if index not in self._plans:
+            self._plans[index] = _compile(
+                list(self._values.get(self._keys[index], [])), self._keys, index + 1
+            )
+        return _render(self._plans[index], self)
+
+
+def replace(
+    where: Element, keys: Sequence[str], values: dict[str, list[Element]]
+) -> None:
+    """
+    Replace placeholders in an element, in place.
+
+    The result is the same as replacing each placeholder in turn, but each Str
+    is scanned once and the elements without placeholders are left untouched.
+
+    Arguments
+    ---------
+    where
+        The element to modify
+    keys
+        The placeholders, in replacement order
+    values
+        The elements replacing each placeholder
+    """
+    keys = tuple(keys)
+    if _recursive(keys, values):
+        _replace_sequential(where, keys, values)
+        return
+
+    state = _Values(keys, values)
+    search = _scanner(keys, 0)
+
+    def replacing(item: Element, _) -> list[Element] | None:
+        if isinstance(item, Str) and (
+            search is None or search[0].search(item.text) is not None
+        ):
+            items = split(item.text, keys)
+            if items != [item.text]:
+                result: list[Element] = []
+                _render_text(items, state, result)
+                return result
+        return None
+
+    where.walk(replacing)
+
+
+def split(text: str, keys: tuple[str, ...], start: int = 0) -> list[str | int]:
+    """
+    Split a text at the placeholders.
+
+    Arguments
+    ---------
+    text
+        The text to split
+    keys
+        The placeholders, in replacement order
+    start
+        The index of the first placeholder to look for
+
+    Returns
+    -------
+    list[str | int]
+        The non-empty literal parts and the indexes of the placeholders
+    """
+    scanner = _scanner(keys, start)
+    if scanner is None:
+        return _split(text, keys, start)
+    regex, indexes = scanner
+    items: list[str | int] = []
+    position = 0
+    for match in regex.finditer(text):
+        if match.start() > position:
+            items.append(text[position : match.start()])
+        items.append(indexes[match.group()])
+        position = match.end()
+    if not items:
+        return [text]
+    if position < len(text):
+        items.append(text[position:])
+    return items
+
+
+def _split(text: str, keys: tuple[str, ...], start: int) -> list[str | int]:
+    for index in range(start, len(keys)):
+        parts = text.split(keys[index])
+        if len(parts) > 1:
+            items: list[str | int] = []
+            for position, part in enumerate(parts):
+                if position:
+                    items.append(index)
+                if part:
+                    items.extend(_split(part, keys, index + 1))
+            return items
+    return [text]
+
+
+@lru_cache(maxsize=64)
+def _scanner(
+    keys: tuple[str, ...], start: int
+) -> tuple[re.Pattern[str], dict[str, int]] | None:
+    # A single left to right scan finds the same occurrences as the
+    # replacement in turn only if two occurrences can never overlap.
+    for key in keys:
+        if not key:
+            return None
+        for other in keys:
+            if (key != other and key in other) or any(
+                other.startswith(key[position:]) for position in range(1, len(key))
+            ):
+                return None
+    regex = re.compile("|".join(re.escape(key) for key in keys[start:]) or "(?!)")
+    return regex, {key: index for index, key in enumerate(keys) if index >= start}
+
+
+def _compile(elems: list[Element], keys: tuple[str, ...], start: int) -> list[tuple]:
+    plan = []
+    for elem in elems:
+        if isinstance(elem, Str):
+            items = split(elem.text, keys, start)
+            if items == [elem.text]:
+                plan.append((_STATIC, elem))
+            else:
+                plan.append((_TEXT, items))
+        elif isinstance(elem, _CONTAINERS):
+            children = _compile(list(elem.content), keys, start)
+            if all(step[0] == _STATIC for step in children):
+                plan.append((_STATIC, elem))
+            else:
+                shell = clone(elem)
+                shell.content = []
+                plan.append((_CONTAINER, shell, children))
+        elif _contains(elem, keys[start:]):
+            plan.append((_WALK, elem, start))
+        else:
+            plan.append((_STATIC, elem))
+    return plan
+
+
+def clone(elem: Element) -> Element:
+    """
+    Copy an element without copying its ancestors.
+
+    Arguments
+    ---------
+    elem
+        The element to copy
+
+    Returns
+    -------
+    Element
+        A detached copy of the element
+    """
+    if type(elem) is Str:  # pylint: disable=unidiomatic-typecheck
+        return Str(elem.text)
+    if type(elem) in _LEAVES:
+        return type(elem)()
+    parent = elem.parent
+    elem.parent = None
+    try:
+        return copy.deepcopy(elem)
+    finally:
+        elem.parent = parent
+
+
+def lowering(elem: Element, _) -> None:
+    """
+    Lower element.
+
+    Arguments
+    ---------
+    elem
+        element to lower
+    """
+    if isinstance(elem, Str):
+        elem.text = elem.text.lower()
+
+
+def contains(elems: Iterable[Element], keys: tuple[str, ...]) -> bool:
+    """
+    Tell if elements contain placeholders.
+
+    Arguments
+    ---------
+    elems
+        The elements
+    keys
+        The placeholders
+
+    Returns
+    -------
+    bool
+        True if a Str of the elements contains one of the placeholders
+    """
+    return any(_contains(elem, keys) for elem in elems)
+
+
+def _recursive(keys: tuple[str, ...], values: dict[str, list[Element]]) -> bool:
+    # A value containing its own placeholder is replaced again each time it is
+    # met: only the replacement in turn can reproduce that.
+    return any(_contains(elem, (key,)) for key in keys for elem in values.get(key, []))
+
+
+def _replace_sequential(
+    where: Element, keys: tuple[str, ...], values: dict[str, list[Element]]
+) -> None:
+    for key in keys:
+        value = [clone(elem) for elem in values.get(key, [])]
+
+        def replacing(item: Element, _, key=key, value=value) -> list | None:
+            if isinstance(item, Str):
+                parts = item.text.split(key)
+                if len(parts) > 1:
+                    result = [Str(parts[0])] if parts[0] else []
+                    for part in parts[1:]:
+                        result.extend(value)
+                        if part:
+                            result.append(Str(part))
+                    return result
+            return None
+
+        where.walk(replacing)
+
+
+def _contains(elem: Element, keys: tuple[str, ...]) -> bool:
+    found = []
+
+    def search(item: Element, _) -> None:
+        if isinstance(item, Str) and any(key in item.text for key in keys):
+            found.append(item)
+
+    elem.walk(search)
+    return bool(found)
+
+
+def _render(plan: list[tuple], values: _Values) -> list[Element]:
+    result: list[Element] = []
+    for step in plan:
+        if step[0] == _STATIC:
+            result.append(clone(step[1]))
+        elif step[0] == _TEXT:
+            _render_text(step[1], values, result)
+        elif step[0] == _CONTAINER:
+            elem = clone(step[1])
+            elem.content = _render(step[2], values)
+            result.append(elem)
+        else:
+            result.append(_render_walk(step[1], step[2], values))
+    return result
+
+
+def _render_text(
+    items: list[str | int], values: _Values, result: list[Element]
+) -> None:
+    for item in items:
+        if isinstance(item, str):
+            result.append(Str(item))
+        else:
+            result.extend(values.fill(item))
+
+
+def _render_walk(elem: Element, start: int, values: _Values) -> Element:
+    def replacing(item: Element, _) -> list[Element] | None:
+        if isinstance(item, Str):
+            items = split(item.text, values.keys, start)
+            if items != [item.text]:
+                result: list[Element] = []
+                _render_text(items, values, result)
+                return result
+        return None
+
+    return clone(elem).walk(replacing)
@@ -0,0 +1,39 @@
+import json
+import os
+import runpy
+from unittest import TestCase
+
+from panflute import Link, Span, stringify
+
+from .helper import conversion
+
+generate = runpy.run_path(
+    os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "benchmarks", "generate.py"
+    )
+)["generate"]
+
+
+class BenchmarkTest(TestCase):
+    def test_generate(self):
+        markdown = generate(
+            headers=6, items=20, categories=3, references=12, paragraphs=10
+        )
+        doc = conversion(markdown)
+        self.assertEqual(doc.statistics["numbered"], 20)
+        self.assertEqual(sorted(doc.defined), ["cat0", "cat1", "cat2"])
+
+        texts = []
+
+        def collecting(elem, _):
+            if isinstance(elem, Link) or (
+                isinstance(elem, Span) and "pandoc-numbering-text" in elem.classes
+            ):
+                texts.append(stringify(elem))
+
+        doc.walk(collecting)
+        # The entries of the listings, the numbered items and the references
+        self.assertEqual(len(texts), 20 + 20 + 8)
+        # All the references are resolved
+        self.assertEqual([text for text in texts[20:] if "%" in text], [])
+        self.assertNotIn('"@cat', json.dumps(doc.to_json()))
@@ -0,0 +1,151 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, mock
+
+from panflute import convert_text
+
+import pandoc_numbering
+from pandoc_numbering import _main
+from pandoc_numbering._book import BOOK
+
+from .helper import conversion
+
+METADATA = r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      sectioning-levels: '+.+.'
+      listing-title: List of exercises
+---
+"""
+
+CHAPTERS = [
+    r"""
+# First
+
+Exercise (Before [](#exercise:last)) #
+
+## Inner
+
+Exercise (See @exercise:last) #exercise:first
+
+Figure (%c figures) #
+""",
+    r"""
+# Second
+
+Figure #
+
+Not numbered ##
+
+Exercise #
+""",
+    r"""
+# Third
+
+## Last
+
+Exercise (After [](#exercise:first)) #exercise:last
+""",
+]
+
+
+def filtering(markdown, output_format, path):
+    # Run the filter on the JSON text of a chapter, as pandoc does
+    env = dict(os.environ, **{BOOK: path})
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(pandoc_numbering.__file__))
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import pandoc_numbering; pandoc_numbering.main()",
+            output_format,
+        ],
+        input=convert_text(markdown, output_format="json", standalone=True).encode(
+            "utf-8"
+        ),
+        capture_output=True,
+        check=True,
+        env=env,
+    )
+    return json.loads(process.stdout)["blocks"]
+
+
+class BookTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "book.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self, chapters, output_format="markdown", first=False):
+        # Only the first chapter holds the configuration if first is True
+        texts = [
+            chapter if first and index else METADATA + chapter
+            for index, chapter in enumerate(chapters)
+        ]
+        indexes = []
+        for text in texts:
+            doc = convert_text(text, standalone=True)
+            doc.format = output_format
+            indexes.append(json.loads(json.dumps(_main.chapter_index(doc))))
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(_main.merge_indexes(indexes), file)
+        with mock.patch.dict(os.environ, {BOOK: self.path}):
+            return [
+                conversion(text, output_format).to_json()["blocks"] for text in texts
+            ]
+
+    def test_book(self):
+        for output_format in ("markdown", "latex"):
+            expected = conversion(
+                METADATA + "".join(CHAPTERS), output_format
+            ).to_json()["blocks"]
+            blocks = self.build(CHAPTERS, output_format)
+            # Each LaTeX chapter starts with the (empty) list of listings
+            for chapter in blocks[1:] if output_format == "latex" else []:
+                self.assertEqual(chapter.pop(0)["t"], "Plain")
+            self.assertEqual(
+                [block for chapter in blocks for block in chapter], expected
+            )
+            self.assertIn("Exercise 3.1.1 (After )", json.dumps(blocks[0]))
+            self.assertIn('"2.0.1"', json.dumps(blocks[1]))
+            self.assertIn(
+                '"2"}, {"t": "Space"}, {"t": "Str", "c": "figures"',
+                json.dumps(blocks[0]),
+            )
+
+    def test_unknown(self):
+        self.build(CHAPTERS)
+        with (
+            mock.patch.dict(os.environ, {BOOK: self.path}),
+            mock.patch.object(_main, "debug") as debug,
+        ):
+            doc = conversion(METADATA + CHAPTERS[1].replace("Figure #", ""))
+        debug.assert_called_once_with(
+            "[WARNING] pandoc-numbering: the chapter is not in the book"
+        )
+        self.assertIn('"1.0.1"', json.dumps(doc.to_json()))
+
+    def test_configuration(self):
+        # The chapters without metadata use the configuration of the first one
+        expected = conversion(METADATA + "".join(CHAPTERS)).to_json()["blocks"]
+        blocks = self.build(CHAPTERS, first=True)
+        self.assertEqual([block for chapter in blocks for block in chapter], expected)
+        self.assertIn('"2.0.1"', json.dumps(blocks[1]))
+
+    def test_references(self):
+        # The last chapter has no marker: it only cites and counts
+        chapters = CHAPTERS + [
+            "\n# Fourth\n\nSee @exercise:first and [%c]{#exercise:first} here.\n"
+        ]
+        expected = conversion(METADATA + "".join(chapters)).to_json()["blocks"]
+        self.build(chapters, first=True)
+        blocks = filtering(chapters[-1], "markdown", self.path)
+        self.assertEqual(blocks, expected[-2:])
+        self.assertIn('"#exercise:first"', json.dumps(blocks))
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase, mock
+
+from panflute import Plain, Str
+
+from pandoc_numbering._cache import CACHE, Cache
+
+from .helper import conversion
+
+MARKDOWN = r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      listing-title: List of exercises
+---
+
+Exercise (<http://a.org>) #
+
+Exercise (<http://b.org>) #
+"""
+
+
+class CacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_warm_rebuild(self):
+        with mock.patch.dict(os.environ, {CACHE: self.path}):
+            cold = conversion(MARKDOWN, "latex")
+            warm = conversion(MARKDOWN, "latex")
+        self.assertEqual(cold.conversions.calls, 1)
+        self.assertEqual(cold.conversions.hits, 0)
+        self.assertEqual(warm.conversions.calls, 0)
+        self.assertEqual(warm.conversions.hits, 3)
+        self.assertEqual(
+            [elem.content[0].text for elem in warm.metadata["header-includes"]],
+            [elem.content[0].text for elem in cold.metadata["header-includes"]],
+        )
+
+    def test_eviction(self):
+        cache = Cache(self.path, size=250)
+        keys = [cache.key(Plain(Str(str(index))), "latex", []) for index in range(3)]
+        for key in keys:
+            cache.put(key, "x" * 50)
+        cache.get(keys[0])
+        cache.close()
+
+        cache = Cache(self.path, size=250)
+        self.assertEqual(cache.get(keys[0]), "x" * 50)
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.get(keys[2]), "x" * 50)
+        cache.close()
+
+    def test_error(self):
+        # A locked cache is turned off and the conversions are made without it
+        cache = Cache(self.path)
+        cache._connection.close()
+        cache._connection = mock.Mock(
+            **{"execute.side_effect": sqlite3.OperationalError("database is locked")}
+        )
+        with (
+            mock.patch.dict(os.environ, {CACHE: self.path}),
+            mock.patch.object(Cache, "from_environment", return_value=cache),
+            mock.patch("pandoc_numbering._cache.debug") as debug,
+        ):
+            doc = conversion(MARKDOWN, "latex")
+        debug.assert_called_once_with(
+            "[WARNING] pandoc-numbering: the cache is turned off: database is locked"
+        )
+        self.assertEqual(doc.conversions.calls, 1)
+        self.assertEqual(doc.conversions.hits, 0)
+        self.assertEqual(
+            [elem.content[0].text for elem in doc.metadata["header-includes"]],
+            [
+                elem.content[0].text
+                for elem in conversion(MARKDOWN, "latex").metadata["header-includes"]
+            ],
+        )
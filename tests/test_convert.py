@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from panflute import CodeBlock, Doc, Para, RawBlock, Str, convert_text
+
+from pandoc_numbering._convert import PLACEHOLDER, SEPARATOR, Conversions
+
+from .helper import conversion
+
+
+class ConvertTest(TestCase):
+    def test_latex_batch(self):
+        doc = conversion(
+            r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      listing-title: List of *exercises*
+---
+
+Exercise (![a](a.png)) #
+
+Exercise (<http://a.org>) #
+
+Exercise (Native) #
+            """,
+            "latex",
+        )
+        self.assertEqual(doc.conversions.calls, 1)
+        text = convert_text(doc, input_format="panflute", output_format="latex")
+        self.assertNotIn(PLACEHOLDER, text)
+        self.assertIn(r"\url{http://a.org}", text)
+        self.assertIn(
+            r"\newlistof{exercise}{exercise}{List of \emph{exercises}}",
+            [elem.content[0].text for elem in doc.metadata["header-includes"]][-2],
+        )
+
+    def test_separator(self):
+        # Fragments producing or swallowing a separator are converted alone
+        conversions = Conversions(Doc())
+        blocks = [
+            Para(Str("a")),
+            CodeBlock(f"x\n{SEPARATOR}\ny"),
+            RawBlock(f"\\iffalse\n{SEPARATOR}\n\\fi", format="latex"),
+            Para(Str("b")),
+        ]
+        placeholders = [conversions.add(block).placeholder for block in blocks]
+        conversions.run()
+        self.assertEqual(conversions.calls, 1 + len(blocks))
+        self.assertEqual(
+            conversions.substitute("|".join(placeholders)),
+            "|".join(
+                convert_text(block, input_format="panflute", output_format="latex")
+                for block in blocks
+            ),
+        )
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from panflute import stringify
+
+from pandoc_numbering import _main
+from pandoc_numbering._counter import shared
+from pandoc_numbering._state import STATE
+
+from .helper import conversion
+
+MARKDOWN = r"""
+---
+pandoc-numbering:
+  theorem:
+    general:
+      sectioning-levels: '+.'
+  lemma:
+    general:
+      sectioning-levels: '+.'
+      counter: theorem
+  corollary:
+    general:
+      sectioning-levels: '+.'
+      counter: lemma
+---
+
+# First
+
+Theorem #theorem:a
+
+Lemma (%c lemmas) #lemma:b
+
+Theorem #theorem:c
+
+# Second
+
+Corollary #corollary:d
+
+Lemma #lemma:e
+
+See @theorem:c, @lemma:e and [%g](#corollary:d)
+"""
+
+
+class CounterTest(TestCase):
+    def test_shared(self):
+        doc = conversion(MARKDOWN)
+        numbers = {tag: record.local_number for tag, record in doc.information.items()}
+        self.assertEqual(
+            numbers,
+            {
+                "theorem:a": "1.1",
+                "lemma:b": "1.2",
+                "theorem:c": "1.3",
+                "corollary:d": "2.1",
+                "lemma:e": "2.2",
+            },
+        )
+        # The counts of the categories are not shared
+        self.assertEqual(doc.count["lemma:1."], 1)
+        self.assertEqual(doc.count["@theorem:1."], 3)
+        self.assertEqual(stringify(doc.content[2]).strip(), "Lemma 1.2 (1 lemmas)")
+        self.assertEqual(
+            stringify(doc.content[7]).strip(), "See Theorem 1.3, Lemma 2.2 and 2.1"
+        )
+
+    def test_shared_function(self):
+        defined = {
+            "a": {"counter": None},
+            "b": {"counter": "a"},
+            "c": {"counter": "b"},
+            "d": {"counter": "e"},
+            "e": {"counter": None},
+            "f": {"counter": None},
+        }
+        self.assertEqual(
+            shared(defined), {"a": "a", "b": "a", "c": "a", "d": "e", "e": "e"}
+        )
+        with mock.patch("pandoc_numbering._counter.debug") as debug:
+            self.assertEqual(shared({"a": {"counter": "b"}, "b": {"counter": "a"}}), {})
+        self.assertEqual(debug.call_count, 2)
+
+    def test_incorrect(self):
+        markdown = MARKDOWN.replace("counter: lemma", "counter: '#lemma'")
+        with mock.patch("pandoc_numbering._main.debug") as debug:
+            doc = conversion(markdown)
+        debug.assert_any_call(
+            "[WARNING] pandoc-numbering: counter is not correct for category "
+            "corollary"
+        )
+        self.assertEqual(doc.information["corollary:d"].local_number, "2.1")
+        self.assertEqual(doc.information["lemma:e"].local_number, "2.1")
+
+    def test_modes(self):
+        expected = json.dumps(conversion(MARKDOWN).to_json())
+        with mock.patch.dict(os.environ, {_main.JOBS: "2"}):
+            self.assertEqual(json.dumps(conversion(MARKDOWN).to_json()), expected)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "state")
+            with mock.patch.dict(os.environ, {STATE: path}):
+                for _ in range(2):
+                    self.assertEqual(
+                        json.dumps(conversion(MARKDOWN).to_json()), expected
+                    )
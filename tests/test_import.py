@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+import pandoc_numbering
+
+# Modules of pandoc-numbering only needed for filtering
+FILTERING = ("_main", "_template", "_convert", "_stream", "_block", "_book", "_state")
+
+# Standard library modules only imported by the optional features
+OPTIONAL = (
+    "pandoc_numbering._cache",
+    "sqlite3",
+    "hashlib",
+    "socket",
+    "tempfile",
+    "urllib.request",
+)
+
+# Budgets of the import times, relative to those of the interpreter startup
+# for the passthrough path and of panflute for the filter path, so that they
+# do not depend on the speed of the machine
+PASSTHROUGH_BUDGET = 0.25
+FILTER_BUDGET = 0.25
+
+
+def imports(module, cache):
+    # Self times in microseconds of the modules imported by a module
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=cache)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(pandoc_numbering.__file__))
+    result = {}
+    # The first run writes the byte code
+    for _ in range(2):
+        stderr = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            check=True,
+            env=env,
+            text=True,
+        ).stderr
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            fields = line[len("import time:") :].split("|")
+            if fields[0].strip().isdigit():
+                result[fields[2].strip()] = int(fields[0])
+    return result
+
+
+class ImportTest(TestCase):
+    def setUp(self):
+        self.cache = tempfile.mkdtemp()
+
+    def test_passthrough(self):
+        # sys is already imported: only the modules of the startup are listed
+        startup = imports("sys", self.cache)
+        modules = imports("pandoc_numbering", self.cache)
+        self.assertIn("pandoc_numbering._raw", modules)
+        self.assertNotIn("panflute", modules)
+        self.assertNotIn("typing", modules)
+        for name in FILTERING:
+            self.assertNotIn(f"pandoc_numbering.{name}", modules)
+        own = {
+            name: time
+            for name, time in modules.items()
+            if name.startswith("pandoc_numbering")
+        }
+        self.assertLess(
+            sum(own.values()), PASSTHROUGH_BUDGET * sum(startup.values()), own
+        )
+
+    def test_filter(self):
+        base = imports("panflute", self.cache)
+        modules = imports("pandoc_numbering._stream", self.cache)
+        # Only the modules not already imported by panflute are checked
+        added = {name: time for name, time in modules.items() if name not in base}
+        for name in FILTERING:
+            self.assertIn(f"pandoc_numbering.{name}", added)
+        for name in OPTIONAL:
+            self.assertNotIn(name, added)
+        self.assertLess(sum(added.values()), FILTER_BUDGET * sum(base.values()), added)
@@ -0,0 +1,82 @@
+from unittest import TestCase
+
+from panflute import (
+    Code,
+    Emph,
+    Image,
+    Link,
+    Math,
+    Plain,
+    Quoted,
+    SmallCaps,
+    Space,
+    Span,
+    Str,
+    Strikeout,
+    Strong,
+    Subscript,
+    Superscript,
+    convert_text,
+)
+
+from pandoc_numbering._latex import inlines_to_latex
+
+
+def pandoc_latex(*elems):
+    return convert_text(
+        Plain(*elems),
+        input_format="panflute",
+        output_format="latex",
+        extra_args=["--syntax-highlighting=none"],
+    )
+
+
+class LatexTest(TestCase):
+    def verify(self, *elems):
+        self.assertEqual(inlines_to_latex(elems), pandoc_latex(*elems))
+
+    def test_escape(self):
+        self.verify(Str("a{b}c$d%e&f_g#h^i\\j~k|l<m>n[o]p'q\"r`s"))
+        self.verify(Str("x<"), Str("y"), Space(), Str("<1"), Space(), Str("a\\ b"))
+        self.verify(Str("--x---"), Space(), Str("a b…c‘d’e“f”g—h–i"))
+        self.verify(Str("?`!`"), Space(), Str("‘`"), Space(), Str("é"))
+
+    def test_commands(self):
+        self.verify(
+            Emph(Str("a")),
+            Strong(Str("b")),
+            SmallCaps(Str("c")),
+            Strikeout(Str("d"), Math("x", format="InlineMath"), Code("y z")),
+            Superscript(Str("e")),
+            Subscript(Str("f")),
+        )
+
+    def test_code_math(self):
+        self.verify(Code("a{b}'`~\\ x--y<z>|"))
+        self.verify(Math("x^2", format="InlineMath"), Math("y", format="DisplayMath"))
+
+    def test_span_link(self):
+        self.verify(Span(Str("a"), classes=["foo"]), Span(Str("b"), identifier="x"))
+        self.verify(Link(Str("a"), url="#sec:1.2"), Link(Str("b"), url="#é x"))
+
+    def test_quoted(self):
+        self.verify(
+            Quoted(
+                Quoted(Str("a"), quote_type="SingleQuote"), quote_type="DoubleQuote"
+            ),
+            Space(),
+            Quoted(Str("`a"), Space(), Str("b'"), quote_type="DoubleQuote"),
+        )
+
+    def test_wrap(self):
+        self.verify(
+            *[
+                elem
+                for index in range(30)
+                for elem in (Space(), Emph(Str("word"), Space(), Str(str(index))))
+            ]
+        )
+
+    def test_unsupported(self):
+        self.assertIsNone(inlines_to_latex([Image(Str("a"), url="a.png")]))
+        self.assertIsNone(inlines_to_latex([Link(Str("a"), url="http://a.org")]))
@@ -0,0 +1,153 @@
+import os
+import re
+from unittest import TestCase, mock
+
+from panflute import convert_text
+
+from pandoc_numbering import _main
+
+from .helper import conversion
+
+MARKDOWN = r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      listing-title: List of exercises
+      sectioning-levels: '+.+.'
+    latex:
+      format-entry-classic: '**%D** %n'
+      format-entry-title: '*%T* (%g) %D'
+  fig0:
+    general:
+      listing-title: List of figures
+---
+
+# First
+
+Exercise #
+
+Exercise (Some *title* with $x^2$) #
+
+Figure (See *this*) #fig0:a
+
+Exercise (Cost of %n) #
+
+Figure #fig1:b
+"""
+
+
+def latex(environment, markdown=MARKDOWN):
+    with mock.patch.dict(os.environ, environment):
+        doc = conversion(markdown, "latex")
+    return convert_text(
+        doc, input_format="panflute", output_format="latex", standalone=True
+    )
+
+
+def group(text, start):
+    # The text of the braced group starting at start and the index following it
+    depth = 0
+    for index in range(start, len(text)):
+        if text[index] == "{":
+            depth += 1
+        elif text[index] == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start + 1 : index], index + 1
+    raise ValueError(text[start:])
+
+
+def expand(text):
+    # Expand the entry macros defined by the document
+    macros = {}
+    for match in re.finditer(r"\\providecommand\{(\\\w+)\}\[(\d)\]", text):
+        macros[match.group(1)] = (int(match.group(2)), group(text, match.end())[0])
+    text = text[text.index(r"\begin{document}") :]
+    for name, (count, body) in macros.items():
+        call = name + "{"
+        while call in text:
+            start = text.index(call)
+            index = start + len(call) - 1
+            arguments = []
+            for _ in range(count):
+                argument, index = group(text, index)
+                arguments.append(argument)
+            expanded = re.sub(
+                r"#(\d)", lambda m, a=arguments: a[int(m.group(1)) - 1], body
+            )
+            text = text[:start] + expanded + text[index:]
+    return text
+
+
+class MacrosTest(TestCase):
+    def test_macros(self):
+        text = latex({_main.MACROS: "1"})
+        self.assertIn(
+            r"\providecommand{\pnentrycexercise}[2]" r"{{\textbf{#1} #2}}",
+            text,
+        )
+        self.assertIn(r"\pnentrycexercise{Exercise}{1.0.1}", text)
+        # The default entries are made of a placeholder alone
+        self.assertNotIn(r"\pnentrycfigzday", text)
+        self.assertIn(r"\ignorespaces {See \emph{this}}", text)
+        # A title with a placeholder is replaced again by the template
+        self.assertIn(r"{\emph{Cost of 1.0.3} (1.0.3) Exercise}", text)
+        # The macros write the same entries
+        expected = latex({})
+        self.assertEqual(expand(text), expected[expected.index(r"\begin{document}") :])
+
+    def test_disabled(self):
+        with mock.patch.dict(os.environ, {_main.MACROS: "1"}):
+            doc = conversion(MARKDOWN, "markdown")
+        self.assertFalse(doc.macros)
+        self.assertNotIn("pnentry", latex({}))
+
+    def test_names(self):
+        names = {
+            _main.entry_macro(category, kind)
+            for category in ("fig", "fig0", "fig1", "figz", "figzday", "fig-a", "fi_g")
+            for kind in ("classic", "title")
+        }
+        self.assertEqual(len(names), 14)
+        for name in names:
+            self.assertRegex(name, r"^\\[a-zA-Z]+$")
+
+    def test_ligatures(self):
+        markdown = r"""
+---
+pandoc-numbering:
+  pre:
+    general:
+      listing-title: List of prefixes
+    latex:
+      format-entry-classic: '%D-%g'
+  post:
+    general:
+      listing-title: List of suffixes
+    latex:
+      format-entry-classic: '%g !%D'
+  mid:
+    general:
+      listing-title: List of others
+    latex:
+      format-entry-classic: '%D: %g'
+---
+
+Pre- #pre:a
+
+`Post #post:b
+
+Mid- #mid:c
+"""
+        expected = latex({}, markdown)
+        # The default output is written as before
+        self.assertIn(r"{Pre--1}", expected)
+        self.assertIn(r"{1 !`Post}", expected)
+        self.assertIn(r"{Mid-: 1}", expected)
+        text = latex({_main.MACROS: "1"}, markdown)
+        # An argument next to a ligature character is not given to a macro
+        self.assertNotIn(r"\pnentrycpre", text)
+        self.assertNotIn(r"\pnentrycpost", text)
+        self.assertIn(r"\pnentrycmid{Mid-}{1}", text)
+        self.assertEqual(expand(text), expected[expected.index(r"\begin{document}") :])
@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from .helper import verify_conversion
+from .helper import conversion, verify_conversion
 
 
 class ParaTest(TestCase):
@@ -228,3 +228,16 @@ header-includes:
             """,
             "latex",
         )
+
+    def test_para_statistics(self):
+        doc = conversion(r"""
+Example #
+
+Not an example
+
+C# is not an example ##
+
+Term #
+:   Definition
+            """)
+        self.assertEqual(doc.statistics, {"rejected": 1, "parsed": 3, "numbered": 2})
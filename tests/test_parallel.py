@@ -0,0 +1,69 @@
+import json
+import os
+from unittest import TestCase, mock
+
+from pandoc_numbering import _main
+
+from .helper import conversion
+
+MARKDOWN = r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      listing-title: List of exercises
+      sectioning-levels: '+.+.'
+---
+
+Exercise (Before [](#exercise:last)) #
+
+# First
+
+Exercise (<http://a.org>) #
+
+## Inner
+
+Exercise (See @exercise:last) #exercise:first
+
+Term (%c terms) #
+
+:   Definition
+
+# Second {.unnumbered}
+
+Figure (%c figures) #
+
+Not numbered ##
+
+# Third
+
+Figure #
+
+Exercise (After [](#exercise:first)) #exercise:last
+"""
+
+
+class ParallelTest(TestCase):
+    def build(self, output_format):
+        with (
+            mock.patch.dict(os.environ, {_main.JOBS: "2"}),
+            mock.patch.object(
+                _main, "number_section", wraps=_main.number_section
+            ) as numbering,
+        ):
+            doc = conversion(MARKDOWN, output_format)
+        self.assertEqual(
+            json.dumps(doc.to_json()),
+            json.dumps(conversion(MARKDOWN, output_format).to_json()),
+        )
+        return numbering.call_count
+
+    def test_parallel(self):
+        for output_format in ("markdown", "latex"):
+            # All the sections are numbered by the workers
+            self.assertEqual(self.build(output_format), 0)
+
+    def test_fallback(self):
+        # Without the quick pass, only the first two sections start as expected
+        with mock.patch.object(_main, "counting", return_value=None):
+            self.assertEqual(self.build("markdown"), 2)
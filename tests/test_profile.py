@@ -0,0 +1,118 @@
+import os
+import pstats
+import runpy
+import tempfile
+from unittest import TestCase, mock
+
+from pandoc_numbering import _profile
+
+from .helper import conversion
+
+generate = runpy.run_path(
+    os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "benchmarks", "generate.py"
+    )
+)["generate"]
+
+MARKDOWN = r"""
+---
+pandoc-numbering:
+  figure:
+    general:
+      listing-title: List of figures
+---
+
+# First
+
+Figure (See @exercise:last) #
+
+Exercise #exercise:first
+
+Exercise (*Emphasized*) #exercise:last
+"""
+
+
+class ProfileTest(TestCase):
+    def report(self, environment, output_format="markdown"):
+        with (
+            mock.patch.dict(os.environ, environment),
+            mock.patch.object(_profile, "debug") as debug,
+        ):
+            conversion(MARKDOWN, output_format)
+        return [call.args[0] for call in debug.call_args_list]
+
+    def test_disabled(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop(_profile.PROFILE, None)
+            os.environ.pop(_profile.PROFILE_STATS, None)
+            os.environ.pop(_profile.PROFILE_MEMORY, None)
+            self.assertIsNone(_profile.Profile.from_environment())
+        self.assertIsNone(conversion(MARKDOWN).profile)
+
+    def test_report(self):
+        lines = self.report({_profile.PROFILE: "1"}, "latex")
+        phases = [phase.split()[0] for phase in lines[0].split(": ")[1].split(", ")]
+        self.assertEqual(
+            phases,
+            ["prepare", "numbering", "finalize", "referencing", "conversions"],
+        )
+        self.assertRegex(lines[1], r"[1-9]\d* pandoc call\(s\) in ")
+        self.assertEqual(
+            sorted(line.split(": ")[1] for line in lines[2:]),
+            ["exercise", "figure"],
+        )
+        self.assertIn("exercise: 2 element(s) numbered in ", lines[2] + lines[3])
+
+    def test_top(self):
+        profile = _profile.Profile()
+        for index in range(_profile.TOP + 2):
+            profile.numbered(f"cat{index}", float(index))
+        with mock.patch.object(_profile, "debug") as debug:
+            profile.report()
+        lines = [call.args[0] for call in debug.call_args_list]
+        self.assertEqual(len(lines), 2 + _profile.TOP + 1)
+        self.assertIn(f": cat{_profile.TOP + 1}: ", lines[2])
+        self.assertIn(": 2 other categories: 2 element(s) ", lines[-1])
+
+    def test_exclusive(self):
+        profile = _profile.Profile()
+        with profile.phase("outer"):
+            with profile.phase("inner"):
+                pass
+        self.assertEqual(list(profile.phases), ["outer", "inner"])
+
+    def test_stats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "numbering.pstats")
+            self.report({_profile.PROFILE_STATS: path})
+            stats = pstats.Stats(path)
+            self.assertTrue(any(name == "traversing" for _, _, name in stats.stats))
+
+    def test_memory(self):
+        lines = self.report({_profile.PROFILE_MEMORY: "1"})
+        peaks = lines[-3].split("peak memory: ")[1].split(", ")
+        self.assertEqual(
+            [peak.split()[0] for peak in peaks],
+            ["prepare", "numbering", "finalize", "referencing", "conversions"],
+        )
+        self.assertEqual(
+            sorted(line.split(": ")[1] for line in lines[-2:]),
+            ["exercise", "figure"],
+        )
+        self.assertRegex(
+            lines[-1],
+            r"KiB of information, [\d.]+ KiB of fragments, [\d.]+ KiB of collection",
+        )
+
+    def test_retained(self):
+        # The numbering state grows linearly and does not hold the document
+        sizes = []
+        for items in (40, 160):
+            doc = conversion(
+                generate(headers=4, items=items, references=items // 2, paragraphs=0)
+            )
+            retained = _profile.retained(doc)
+            self.assertEqual(sorted(retained), ["cat0", "cat1", "cat2", "cat3"])
+            sizes.append(sum(sum(size) for size in retained.values()) / items)
+        self.assertLess(sizes[0], 8192)
+        self.assertLess(sizes[1], sizes[0] * 1.2)
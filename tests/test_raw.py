@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+from unittest import TestCase, mock
+
+from panflute import convert_text
+
+import pandoc_numbering
+from pandoc_numbering._raw import PASSTHROUGH, untouched
+
+# Run the filter and tell on the standard error if panflute was imported
+SCRIPT = """
+import sys
+import pandoc_numbering
+pandoc_numbering.main()
+sys.stderr.write(str("panflute" in sys.modules))
+"""
+
+
+def filtering(data, output_format, environ=None):
+    env = dict(os.environ, **(environ or {}))
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(pandoc_numbering.__file__))
+    process = subprocess.run(
+        [sys.executable, "-c", SCRIPT, output_format],
+        input=data,
+        capture_output=True,
+        check=True,
+        env=env,
+    )
+    return process.stdout, process.stderr.decode("utf-8")
+
+
+class RawTest(TestCase):
+    def test_passthrough(self):
+        data = convert_text(
+            "# Section\n\nNothing to *number* @item\n",
+            output_format="json",
+            standalone=True,
+        ).encode("utf-8")
+        self.assertEqual(filtering(data, "html"), (data, "False"))
+
+    def test_passthrough_latex(self):
+        data = convert_text(
+            "Nothing to number\n", output_format="json", standalone=True
+        ).encode("utf-8")
+        output, imported = filtering(data, "latex")
+        self.assertEqual(imported, "True")
+        self.assertIn("tocloft", output.decode("utf-8"))
+        self.assertEqual(filtering(data, "latex", {PASSTHROUGH: "1"}), (data, "False"))
+
+    def test_numbered(self):
+        data = convert_text(
+            "Exercise #\n", output_format="json", standalone=True
+        ).encode("utf-8")
+        output, imported = filtering(data, "html")
+        self.assertEqual(imported, "True")
+        self.assertIn("exercise:1", json.dumps(json.loads(output)))
+
+    def test_untouched(self):
+        self.assertTrue(untouched(b'{"blocks":[]}', "html"))
+        self.assertFalse(untouched(b'{"blocks":[]}', "latex"))
+        self.assertFalse(untouched(b'{"c":"#"}', "html"))
+        self.assertFalse(untouched(b'{"c":"\\u0023"}', "html"))
+        self.assertFalse(untouched(b'{"meta":{"pandoc-numbering":{}}}', "html"))
+        with mock.patch.dict(os.environ, {PASSTHROUGH: "1"}):
+            self.assertTrue(untouched(b'{"blocks":[]}', "latex"))
@@ -0,0 +1,67 @@
+import json
+from unittest import TestCase
+
+from panflute import Span
+from panflute.elements import from_json
+
+from pandoc_numbering._record import Record
+
+from .helper import conversion
+
+MARKDOWN = r"""
+# First
+
+Exercise (*Big* Title) #exercise:first
+
+See [%T, %t, %D, %d](#exercise:first "%T %t %D %d %n")
+
+See @exercise:first
+"""
+
+
+class RecordTest(TestCase):
+    def test_record(self):
+        doc = conversion(MARKDOWN)
+        record = doc.information["exercise:first"]
+        self.assertIsInstance(record, Record)
+        self.assertEqual(record.title_text, "Big Title")
+        self.assertEqual(record.title_lower, "big title")
+        self.assertEqual(record.description_text, "Exercise")
+        self.assertEqual(record.description_lower, "exercise")
+        self.assertEqual(record.global_number, "1")
+        self.assertIsInstance(record.link, Span)
+        self.assertEqual(doc.collections, {"exercise": ["exercise:first"]})
+
+        # The references use the precomputed texts
+        link = doc.content[2].content[2]
+        self.assertEqual(link.title, "Big Title big title Exercise exercise 1")
+
+    def test_summary(self):
+        record = conversion(MARKDOWN).information["exercise:first"]
+        summary = json.dumps(record.summary())
+        restored = Record(json.loads(summary, object_hook=from_json))
+        self.assertEqual(json.dumps(restored.summary()), summary)
+        self.assertEqual(restored.title_text, record.title_text)
+        self.assertEqual(restored.category, record.category)
+
+    def test_lazy(self):
+        doc = conversion(MARKDOWN + "\nFigure #fig:alone\n")
+        # Nobody cites or lists the figure
+        record = doc.information["fig:alone"]
+        self.assertIsNone(record._link)
+        self.assertIsNone(record._entry)
+        self.assertIsNone(record._caption)
+        # The cited exercise has its link and caption, but no listing entry
+        record = doc.information["exercise:first"]
+        self.assertIsNotNone(record._link)
+        self.assertIsNotNone(record._caption)
+        self.assertIsNone(record._entry)
+        # The fragments are rendered on first access
+        self.assertEqual(record.entry.classes, ["pandoc-numbering-entry", "exercise"])
+        self.assertIs(record.entry, record.entry)
+
+    def test_latex(self):
+        # The LaTeX list of contents needs all the entries
+        doc = conversion(MARKDOWN + "\nFigure #fig:alone\n", "latex")
+        self.assertIsNotNone(doc.information["fig:alone"]._entry)
+        self.assertIsNone(doc.information["fig:alone"]._link)
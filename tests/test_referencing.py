@@ -1,6 +1,10 @@
 from unittest import TestCase
 
-from .helper import verify_conversion
+from panflute import Cite, Link, Span, Str, convert_text, run_filters
+
+from pandoc_numbering import _main
+
+from .helper import conversion, verify_conversion
 
 
 class ReferencincTest(TestCase):
@@ -97,3 +101,77 @@ See [Exercise exercise Title title 1.2 1 2 2 2 `\pageref{exercise:second}`{=tex}
             """,
             "latex",
         )
+
+    def test_referencing_single_traversal(self):
+        markdown = r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      cite-shortcut: true
+---
+
+# Section [see](#exercise:last)
+
+Exercise (See [%T %c](#exercise:last) and @exercise:last) #exercise:first
+
+Term ([%c]{#exercise:first} [](#exercise:first)) #exercise:term
+:   Exercise (Inner [%T](#exercise:term)) #exercise:inner
+
+    See [%T](#exercise:inner) and [*%c*]{#exercise:inner}
+
+- Exercise (@exercise:first) #exercise:last
+
+Exercise (Nested [%T](#exercise:term)) #exercise:nested
+
+See [%T](#exercise:nested)
+
+theorem (A [%T](#theorem:t1)) #theorem:t1
+
+See @theorem:t1 and [%T](#theorem:t1)
+        """
+        single = conversion(markdown)
+        double = convert_text(markdown, standalone=True)
+        double.format = "markdown"
+        run_filters(
+            [_main.numbering, _main.referencing],
+            prepare=_main.prepare,
+            doc=double,
+            finalize=_main.finalize,
+        )
+        self.assertEqual(single.to_json(), double.to_json())
+
+    def test_referencing_many(self):
+        # Many citations in one paragraph, each replaced at its own position
+        doc = conversion(
+            "Exercise #exercise:a\n\nExercise #exercise:b\n\n"
+            + " ".join(f"@exercise:{'ab'[index % 2]} x{index}" for index in range(500))
+        )
+        content = doc.content[2].content
+        links = [item for item in content if isinstance(item, Link)]
+        self.assertEqual(len(links), 500)
+        self.assertFalse(any(isinstance(item, Cite) for item in content))
+        self.assertEqual(
+            [link.url for link in links[:3]],
+            ["#exercise:a", "#exercise:b", "#exercise:a"],
+        )
+        self.assertIsInstance(content[-3], Link)
+        self.assertEqual(content[-1].text, "x499")
+
+    def test_referencing_candidates(self):
+        doc = conversion(r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      cite-shortcut: false
+---
+            """)
+        self.assertTrue(_main.referable(Link(url="#exercise:first"), doc))
+        self.assertFalse(_main.referable(Link(url="#first"), doc))
+        self.assertFalse(_main.referable(Link(url="exercise:first"), doc))
+        self.assertTrue(_main.referable(Cite(Str("@figure:first")), doc))
+        self.assertFalse(_main.referable(Cite(Str("@exercise:first")), doc))
+        self.assertFalse(_main.referable(Cite(Str("@first")), doc))
+        self.assertTrue(_main.referable(Span(identifier="exercise:first"), doc))
+        self.assertFalse(_main.referable(Span(identifier="first"), doc))
@@ -0,0 +1,102 @@
+import gc
+import io
+import math
+import os
+import runpy
+import sys
+import time
+from unittest import TestCase, skipUnless
+
+from panflute import convert_text, load
+
+from pandoc_numbering import _main
+
+generate = runpy.run_path(
+    os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "benchmarks", "generate.py"
+    )
+)["generate"]
+
+# Largest number of numbered items of the default run
+ITEMS = 1000
+
+# Environment variable enabling the run on big books, set to their number of
+# numbered items (for instance SCALING_ITEMS=100000)
+BIG = "SCALING_ITEMS"
+
+# Highest growth exponents allowed for the runtime and for the allocations
+TIME_EXPONENT = 1.3
+MEMORY_EXPONENT = 1.2
+
+
+def exponent(points):
+    # Slope of the least squares fit in log-log scale
+    xs = [math.log(x) for x, _ in points]
+    ys = [math.log(y) for _, y in points]
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum(
+        (x - mx) ** 2 for x in xs
+    )
+
+
+def document(items):
+    return convert_text(
+        generate(
+            headers=max(items // 20, 1),
+            items=items,
+            references=items // 2,
+            paragraphs=items,
+        ),
+        output_format="json",
+        standalone=True,
+    )
+
+
+def measure(text, output_format):
+    # Runtime of the filter and memory blocks still allocated by the document
+    doc = load(io.StringIO(text))
+    doc.format = output_format
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    _main.main(doc)
+    runtime = time.perf_counter() - start
+    gc.collect()
+    return runtime, sys.getallocatedblocks() - blocks
+
+
+class ScalingTest(TestCase):
+    def check(self, smallest, largest):
+        # Sizes growing by half decades from smallest to largest
+        sizes = []
+        size = float(smallest)
+        while round(size) <= largest:
+            sizes.append(round(size))
+            size *= math.sqrt(10)
+        texts = {items: document(items) for items in sizes}
+        for output_format in ("markdown", "latex"):
+            runtimes = []
+            allocations = []
+            for items in sizes:
+                runtime, blocks = measure(texts[items], output_format)
+                runtimes.append((items, runtime))
+                allocations.append((items, blocks))
+            self.assertLess(exponent(runtimes), TIME_EXPONENT, runtimes)
+            self.assertLess(exponent(allocations), MEMORY_EXPONENT, allocations)
+
+    def test_scaling(self):
+        """
+        Check the growth from 100 to 1000 items.
+
+        Only a quadratic behaviour already visible on small documents is
+        caught: the big books are checked by test_big_books.
+        """
+        self.check(100, ITEMS)
+
+    @skipUnless(os.environ.get(BIG), f"set {BIG} to check the big books")
+    def test_big_books(self):
+        """
+        Check the growth from 1000 items to the number given by SCALING_ITEMS.
+        """
+        self.check(ITEMS, int(os.environ[BIG]))
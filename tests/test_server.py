@@ -0,0 +1,232 @@
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase, mock
+
+from pandoc_numbering import _main
+from pandoc_numbering._server import SERVER, Server, options
+
+from .helper import conversion
+
+MARKDOWN = r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      listing-title: List of exercises
+---
+
+Exercise (<http://a.org>) #
+
+Exercise (`x`{.python}) #
+"""
+
+
+class StandIn(BaseHTTPRequestHandler):
+    # Number of requests received
+    requests = 0
+
+    def do_POST(self):
+        StandIn.requests += 1
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        args = ["pandoc", "--from", data.pop("from"), "--to", data.pop("to")]
+        text = data.pop("text")
+        args.extend(f"--{name}={value}" for name, value in data.items())
+        output = subprocess.run(
+            args, input=text, capture_output=True, check=True, text=True
+        ).stdout
+        body = json.dumps({"output": output, "base64": False, "messages": []})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+class Stub(BaseHTTPRequestHandler):
+    # Requests received and raw body of the next response
+    requests = []
+    response = b""
+
+    def do_POST(self):
+        Stub.requests.append(
+            (
+                dict(self.headers),
+                json.loads(self.rfile.read(int(self.headers["Content-Length"]))),
+            )
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(Stub.response)
+
+    def log_message(self, *args):
+        pass
+
+
+class Serving:
+    # HTTP server running a handler in a thread
+    def __init__(self, handler):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+
+    def __enter__(self):
+        self.thread.start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+
+
+MULTIPLE = r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      listing-title: List of exercises
+---
+
+# First
+
+Exercise (<http://a.org>) #
+
+# Second
+
+Exercise (`x`{.python}) #
+"""
+
+
+class ServerTest(TestCase):
+    def test_options(self):
+        self.assertEqual(
+            options(["--syntax-highlighting=none", "--standalone"]),
+            {"syntax-highlighting": "none", "standalone": True},
+        )
+
+    def test_options_names(self):
+        # pandoc server reads its options like a defaults file, whose unknown
+        # keys are rejected
+        data = {"from": "markdown", "to": "latex"}
+        data.update(options(["--syntax-highlighting=none"]))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "defaults.json")
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            result = subprocess.run(
+                ["pandoc", "--defaults", path],
+                input="`x`{.python}",
+                capture_output=True,
+                check=False,
+                text=True,
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), r"\texttt{x}")
+
+    def test_pandoc_server(self):
+        server = Server.start()
+        if server is None:
+            self.skipTest("pandoc server is not available")
+        server.close()
+        expected = conversion(MARKDOWN, "latex")
+        with mock.patch.dict(os.environ, {SERVER: "local"}):
+            doc = conversion(MARKDOWN, "latex")
+        self.assertEqual(doc.conversions.served, doc.conversions.calls)
+        self.assertEqual(doc.to_json(), expected.to_json())
+
+    def test_convert(self):
+        Stub.requests = []
+        with Serving(Stub) as url:
+            server = Server(url + "/")
+            Stub.response = json.dumps(
+                {"output": "\\textbf{x}\n", "base64": False, "messages": []}
+            ).encode("utf-8")
+            self.assertEqual(
+                server.convert(
+                    "**x**", "markdown", "latex", ["--syntax-highlighting=none"]
+                ),
+                "\\textbf{x}",
+            )
+            # Binary outputs, unexpected answers and invalid JSON are failures
+            for response in (
+                {"output": "eA==", "base64": True},
+                {"base64": False},
+                ["x"],
+            ):
+                Stub.response = json.dumps(response).encode("utf-8")
+                self.assertIsNone(server.convert("x", "markdown", "latex"))
+            Stub.response = b"<html>"
+            self.assertIsNone(server.convert("x", "markdown", "latex"))
+        headers, data = Stub.requests[0]
+        self.assertEqual(headers["Content-Type"], "application/json")
+        self.assertEqual(headers["Accept"], "application/json")
+        self.assertEqual(
+            data,
+            {
+                "text": "**x**",
+                "from": "markdown",
+                "to": "latex",
+                "syntax-highlighting": "none",
+            },
+        )
+        self.assertEqual(len(Stub.requests), 5)
+
+    def test_server(self):
+        expected = conversion(MARKDOWN, "latex")
+        with Serving(StandIn) as url:
+            with mock.patch.dict(os.environ, {SERVER: url}):
+                doc = conversion(MARKDOWN, "latex")
+        self.assertEqual(doc.conversions.calls, 1)
+        self.assertEqual(doc.conversions.served, 1)
+        self.assertEqual(doc.to_json(), expected.to_json())
+
+    def test_jobs(self):
+        # The workers use the server started by the main process
+        expected = conversion(MULTIPLE, "latex")
+        with tempfile.TemporaryDirectory() as directory, Serving(StandIn) as url:
+            path = os.path.join(directory, "starts")
+
+            def start():
+                # Written by any process starting a server
+                with open(path, "a", encoding="utf-8") as file:
+                    file.write(f"{os.getpid()}\n")
+                return Server(url)
+
+            with (
+                mock.patch.dict(os.environ, {SERVER: "local", _main.JOBS: "2"}),
+                mock.patch.object(Server, "start", side_effect=start),
+                mock.patch.object(Server, "close") as close,
+            ):
+                StandIn.requests = 0
+                doc = conversion(MULTIPLE, "latex")
+            with open(path, encoding="utf-8") as file:
+                self.assertEqual(file.read(), f"{os.getpid()}\n")
+        close.assert_called_once_with()
+        # The sections converted by the workers and the listing by the parent
+        self.assertGreater(StandIn.requests, 1)
+        self.assertIsNone(doc.conversions.server)
+        self.assertEqual(doc.to_json(), expected.to_json())
+
+    def test_fallback(self):
+        expected = conversion(MARKDOWN, "latex")
+        with mock.patch.dict(os.environ, {SERVER: "http://127.0.0.1:9"}):
+            doc = conversion(MARKDOWN, "latex")
+        self.assertEqual(doc.conversions.calls, 1)
+        self.assertEqual(doc.conversions.served, 0)
+        self.assertEqual(doc.to_json(), expected.to_json())
+
+    def test_statistics(self):
+        with mock.patch.dict(os.environ, {_main.STATISTICS: "1"}):
+            with mock.patch("pandoc_numbering._main.debug") as debug:
+                doc = conversion(MARKDOWN, "latex")
+        debug.assert_any_call(
+            "[INFO] pandoc-numbering: 2 element(s) numbered, 2 parsed, "
+            f"0 rejected without parsing, {doc.conversions.calls} pandoc call(s)"
+        )
+        self.assertGreater(doc.conversions.calls, 0)
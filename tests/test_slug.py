@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from panflute import Code, Header, Quoted, Space, Str, convert_text
+
+from pandoc_numbering._slug import slug, unique
+
+from .helper import conversion
+
+
+def pandoc_identifiers(headers, output_format):
+    text = convert_text(headers, input_format="panflute", output_format=output_format)
+    return [
+        header.identifier
+        for header in convert_text(
+            text, input_format=output_format, output_format="panflute"
+        )
+    ]
+
+
+class SlugTest(TestCase):
+    def verify(self, *headers):
+        for gfm, output_format in ((False, "markdown"), (True, "gfm")):
+            used = {}
+            self.assertEqual(
+                [unique(slug(header.content, gfm), used, gfm) for header in headers],
+                pandoc_identifiers(headers, output_format),
+            )
+
+    def test_slug(self):
+        self.verify(
+            Header(Str("1.2"), Space(), Str("Élan_vital-x.y!")),
+            Header(Quoted(Str("a"), quote_type="DoubleQuote"), Code("b c")),
+            Header(Str("中文"), Space(), Str("ǅ½‿—")),
+            Header(Str("?")),
+            Header(Str("?")),
+            Header(Str("1.2"), Space(), Str("Élan_vital-x.y!")),
+        )
+
+    def test_listing(self):
+        doc = conversion(r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      listing-title: List of exercises
+---
+
+# List of exercises
+
+Exercise #
+            """)
+        self.assertEqual(doc.conversions.calls, 0)
+        self.assertEqual(doc.content[0].identifier, "list-of-exercises-1")
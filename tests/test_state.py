@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from pandoc_numbering import _main
+from pandoc_numbering._state import STATE, State
+
+from .helper import conversion
+
+MARKDOWN = r"""
+---
+pandoc-numbering:
+  exercise:
+    general:
+      listing-title: List of exercises
+---
+
+Exercise (Before [](#exercise:last)) #
+
+# First
+
+Exercise (<http://a.org>) #
+
+## Inner
+
+Exercise (See @exercise:last) #exercise:first
+
+# Second
+
+Figure (%c figures) #
+
+Not numbered ##
+
+# Third
+
+Exercise (After [](#exercise:first)) #exercise:last
+"""
+
+
+class StateTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "state")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self, markdown, output_format="markdown"):
+        with (
+            mock.patch.dict(os.environ, {STATE: self.path}),
+            mock.patch.object(
+                _main, "number_section", wraps=_main.number_section
+            ) as numbering,
+        ):
+            doc = conversion(markdown, output_format)
+        self.assertEqual(
+            json.dumps(doc.to_json()), self.expected(markdown, output_format)
+        )
+        return numbering.call_count
+
+    def expected(self, markdown, output_format):
+        return json.dumps(conversion(markdown, output_format).to_json())
+
+    def test_rebuild(self):
+        for output_format in ("markdown", "latex"):
+            self.path = os.path.join(self.directory.name, output_format)
+            self.assertEqual(self.build(MARKDOWN, output_format), 4)
+            self.assertEqual(self.build(MARKDOWN, output_format), 0)
+
+    def test_edit(self):
+        self.build(MARKDOWN)
+        # The numbers of the third section do not depend on the second one
+        self.assertEqual(self.build(MARKDOWN.replace("figures", "figure")), 1)
+        # A new exercise renumbers the following ones
+        self.assertEqual(
+            self.build(MARKDOWN.replace("## Inner", "Exercise #\n\n## Inner")), 3
+        )
+
+    def test_key(self):
+        self.build(MARKDOWN)
+        self.assertIsNotNone(State(self.path, self.key()).get(self.section()))
+        self.assertIsNone(State(self.path, "other").get(self.section()))
+        self.assertEqual(self.build(MARKDOWN.replace("List of", "All")), 4)
+
+    def key(self):
+        with open(self.path, encoding="utf-8") as file:
+            return json.loads(file.readline())["key"]
+
+    def section(self):
+        with open(self.path, encoding="utf-8") as file:
+            file.readline()
+            return file.readline().split(" ", 1)[0]
@@ -0,0 +1,106 @@
+import io
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from panflute import convert_text, load
+
+import pandoc_numbering
+from pandoc_numbering import _stream
+
+from .helper import conversion
+
+MARKDOWN = r"""
+---
+title: |
+  See [%T %c](#exercise:last)
+pandoc-numbering:
+  exercise:
+    general:
+      listing-title: List of exercises
+---
+
+# Section
+
+Exercise (First [link](https://pandoc.org)) #exercise:first
+
+Exercise [%c]{#exercise:first} #
+
+Term (See @exercise:last) #exercise:term
+:   Exercise (Inner [%T](#exercise:term)) #exercise:inner
+
+Not numbered ##
+
+- Exercise (@exercise:first) #exercise:last
+"""
+
+
+def streaming(markdown, output_format, text=None):
+    text = text or convert_text(markdown, output_format="json", standalone=True)
+    output = io.StringIO()
+    _stream.stream(io.StringIO(text), output, output_format)
+    return json.loads(output.getvalue())
+
+
+class StreamTest(TestCase):
+    def verify(self, output_format, text=None):
+        doc = conversion(MARKDOWN, output_format)
+        self.assertEqual(
+            streaming(MARKDOWN, output_format, text),
+            json.loads(json.dumps(doc.to_json())),
+        )
+
+    def test_stream(self):
+        self.verify("markdown")
+
+    def test_stream_latex(self):
+        self.verify("latex")
+
+    def test_stream_chunks(self):
+        with patch.object(_stream, "CHUNK", 5):
+            self.verify("markdown")
+
+    def test_stream_order(self):
+        data = json.loads(convert_text(MARKDOWN, output_format="json", standalone=True))
+        text = json.dumps(
+            {
+                "blocks": data["blocks"],
+                "pandoc-api-version": data["pandoc-api-version"],
+                "meta": data["meta"],
+            },
+            indent=2,
+        )
+        self.verify("markdown", text)
+
+    def test_load(self):
+        text = convert_text(
+            MARKDOWN + "\nNothing *to* number\n\n> Not [even](https://pandoc.org)\n",
+            output_format="json",
+            standalone=True,
+        )
+        doc = _stream.load(io.StringIO(text), "markdown")
+        self.assertEqual(
+            [isinstance(block, _stream.JsonBlock) for block in doc.content],
+            [False, False, False, False, False, False, True, True],
+        )
+        pandoc_numbering.main(doc)
+        output = io.StringIO()
+        _stream.dump(doc, output)
+
+        expected = load(io.StringIO(text))
+        expected.format = "markdown"
+        pandoc_numbering.main(expected)
+        self.assertEqual(
+            json.loads(output.getvalue()), json.loads(json.dumps(expected.to_json()))
+        )
+
+    def test_needed(self):
+        self.assertFalse(_stream.needed('{"t":"Para","c":[{"t":"Str","c":"a"}]}'))
+        self.assertTrue(_stream.needed('{"t":"Para","c":[{"t":"Str","c":"#"}]}'))
+        self.assertTrue(_stream.needed('{"t":"Header","c":[1,["",[],[]],[]]}'))
+        self.assertTrue(_stream.needed('{"t":"Para","c":[{"t":"Str","c":"\\u0023"}]}'))
+
+    def test_reader(self):
+        reader = _stream.Reader(io.StringIO(' [ {"a": [1, "]"]} , "b" ,[]] '))
+        self.assertEqual(list(reader.array()), ['{"a": [1, "]"]}', '"b"', "[]"])
+        self.assertEqual(reader.peek(), "")
@@ -0,0 +1,84 @@
+import copy
+from functools import partial
+from unittest import TestCase
+
+from panflute import Emph, LineBreak, Link, Note, Para, Plain, Space, Span, Str
+
+from pandoc_numbering._template import Template, replace, split
+
+KEYS = ("%D", "%d", "%T", "%t", "%g", "%s", "%n", "#")
+
+
+def replacing(elem, _, search, value):
+    if isinstance(elem, Str):
+        parts = elem.text.split(search)
+        if len(parts) > 1:
+            result = [Str(parts[0])] if parts[0] else []
+            for part in parts[1:]:
+                result.extend(value)
+                if part:
+                    result.append(Str(part))
+            return result
+    return None
+
+
+def sequential(elems, values, keys=KEYS):
+    plain = Plain(*copy.deepcopy(elems))
+    for key in keys:
+        plain.walk(partial(replacing, search=key, value=copy.deepcopy(values[key])))
+    return [elem.to_json() for elem in plain.content]
+
+
+class TemplateTest(TestCase):
+    def test_split(self):
+        self.assertEqual(split("a%Db%%n#", KEYS), ["a", 0, "b%", 6, 7])
+        self.assertEqual(split("%D%d", KEYS), [0, 1])
+        self.assertEqual(split("abc", KEYS), ["abc"])
+
+    def test_render(self):
+        elems = [
+            Emph(Str("%D"), Space(), Str("x#y")),
+            Span(Str("(%T)"), classes=["a"]),
+            Note(Para(Str("%g-%s"))),
+            Str("%d%t"),
+            LineBreak(),
+        ]
+        values = {
+            "%D": [Str("C#"), Space(), Emph(Str("%T"))],
+            "%d": [Str("c#")],
+            "%T": [Str("%n"), Str("Title")],
+            "%t": [Str("title")],
+            "%g": [Str("1.2")],
+            "%s": [Str("")],
+            "%n": [Str("2")],
+            "#": [Str("2")],
+        }
+        self.assertEqual(
+            [elem.to_json() for elem in Template(elems, KEYS).render(values)],
+            sequential(elems, values),
+        )
+
+    def test_render_recursive(self):
+        elems = [Str("%D"), Space(), Str("%T"), Space(), Str("%D")]
+        values = {key: [] for key in KEYS}
+        values["%D"] = [Span(Str("%T"), Space(), Str("a"))]
+        values["%T"] = [Str("(%T)")]
+        self.assertEqual(
+            [elem.to_json() for elem in Template(elems, KEYS).render(values)],
+            sequential(elems, values),
+        )
+
+    def test_replace(self):
+        keys = ("%T", "%t", "%D", "%d", "%g", "%s", "%n", "#", "%c")
+        values = {key: [Str(key[-1])] for key in keys}
+        values["%T"] = [Str("%D"), Space(), Emph(Str("%c"))]
+        values["%D"] = [Str("%T#")]
+        elems = [Str("a%T%%D%c#"), Space(), Emph(Str("%s")), Str("plain")]
+        link = Link(*copy.deepcopy(elems), url="#a")
+        untouched = link.content[-1]
+        replace(link, keys, values)
+        self.assertEqual(
+            [elem.to_json() for elem in link.content],
+            sequential(elems, values, keys),
+        )
+        self.assertIs(link.content[-1], untouched)